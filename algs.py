@@ -1,38 +1,61 @@
 #  Copyright (c) 2019 Owen Siljander
 import logging
-from datetime import datetime
+import time
 from math import log, sqrt
-from random import randint, seed
+from random import randint
 
 from node import Node, NEG_INF, POS_INF
-from mancala import Mancala
+from mancala import Mancala, BD_SIZE, MOVE_LIMIT
+from stats import SearchStats
+from transposition import TranspositionTable, EXACT, LOWER, UPPER, SOLVED
 
-AB_NODES_EXPANDED = 0
-UCT_NODES_EXPANDED = 0
-FS_NODES_EXPANDED = 0
 EPSILON = 0.00001
 EPSIL = 0.001
+ENDGAME = None  # EndgameDB probed by the searches and rollouts, see set_endgame()
+BOOK = None  # OpeningBook probed by the agents before searching, see set_book()
 
-seed(datetime.now)
-
-# Logging
-config = "%(asctime)s [%(levelname)s]:%(name)s - %(message)s"
-logging.basicConfig(format=config, filename='log.log', level=logging.DEBUG, filemode="w")
+# Logging, nothing is written unless enabled with logs.enable_logging()
 rand_log = logging.getLogger("rand_agent")
-rand_log.disabled = False
-rand_log.setLevel(logging.DEBUG)
-
 alpha_log = logging.getLogger("alphabeta")
-alpha_log.disabled = False
-alpha_log.setLevel(logging.DEBUG)
-
 uct_log = logging.getLogger("uct")
-uct_log.disabled = False
-uct_log.setLevel(logging.DEBUG)
-
 fs_log = logging.getLogger("fsss")
-fs_log.disabled = False
-fs_log.setLevel(logging.DEBUG)
+
+
+def set_endgame(db) -> None:
+	"""
+	Sets the endgame database used by alphabeta, iterative_alphabeta, fsss and the UCT rollouts. Positions it covers are
+	scored from it instead of being searched or simulated any further.
+	:param db: endgame.EndgameDB, or None to stop using one
+	:return: None
+	"""
+	global ENDGAME
+	ENDGAME = db
+
+
+def set_book(book) -> None:
+	"""
+	Sets the opening book used by alphabeta, iterative_alphabeta, uct, UCTAgent and fsss. Book positions are played from
+	it without searching.
+	:param book: book.OpeningBook, or None to stop using one
+	:return: None
+	"""
+	global BOOK
+	BOOK = book
+
+
+def _play_book(m_node: Node) -> bool:
+	"""
+	Plays the book move for the node if there is one.
+	:param m_node: Node to play move for
+	:return: Whether a move was played
+	"""
+	if BOOK is None:
+		return False
+	move = BOOK.probe(m_node.manc, m_node.player)
+	if move is None:
+		return False
+	m_node.play(move)
+	return True
 
 
 # ******************************************************************************
@@ -62,56 +85,328 @@ def random_agent(m_node: Node) -> None:
 # * Depth-limited Alpha-Beta Minimax
 # ******************************************************************************
 
-def alphabeta(m_node, alpha, beta, depth, is_root):
+def alphabeta(m_node, alpha, beta, depth, is_root, table: TranspositionTable = None, stats: SearchStats = None):
 	"""
 	Depth-limited Alpha-Beta Minimax search. Return value should not be captured by user.
+	The search walks the node's own game with play/unplay rather than copying it for every child, the game is restored
+	before the chosen move is played.
 	:param m_node: Node representing state within transition graph.
 	:param alpha: Alpha
 	:param beta: Beta
 	:param depth: Depth limit of search.
 	:param is_root: Used internally, not set by user
+	:param table: Optional transposition table, keep passing the same one between moves to reuse earlier searches.
+	:param stats: Optional SearchStats to add this search's counts to
 	:return: None
 	"""
-	global AB_NODES_EXPANDED
+	if stats is None:
+		stats = SearchStats()
+	if not is_root:
+		stats.start(table)
+		value = _alphabeta(m_node.manc, m_node.player, alpha, beta, depth, False, table, stats)
+		stats.stop()
+		return value
+	if _play_book(m_node):
+		return
+	stats.start(table)
+	best_action = _alphabeta(m_node.manc, m_node.player, alpha, beta, depth, True, table, stats)
+	stats.stop()
+	# Back at root node, play out action
+	# alpha_log.info("Playing move {0}. P1 {1} P2 {2}, Board {3}".format(best_action, m_node.manc.p1_store, m_node.manc.p2_store, m_node.manc.board))
+	m_node.play(best_action)
+	alpha_log.info("Alpha-Beta finished: %s", stats)
+	if table is not None:
+		alpha_log.info("%s", table)
+
+
+def _alphabeta(manc: Mancala, player: int, alpha, beta, depth, is_root, table: TranspositionTable, stats: SearchStats,
+               ply: int = 0):
+	"""
+	Recursive part of alphabeta(), operating on a single mutable game.
+	:param manc: Game, left as it was found on return
+	:param player: Player to move
+	:param table: Transposition table or None
+	:param stats: SearchStats to count into
+	:param ply: Distance from the root
+	:return: Best action at the root, value of the position otherwise
+	"""
+	stats.nodes += 1
+	if ply > stats.max_depth:
+		stats.max_depth = ply
 	# Terminal, return reward
-	AB_NODES_EXPANDED += 1
-	if m_node.leaf or depth == 0:
-		return m_node.reward()
+	if manc.is_terminal or depth == 0:
+		stats.leaves += 1
+		return manc.reward(player)
+	if ENDGAME is not None and not is_root:
+		value = ENDGAME.reward(manc, player)
+		if value is not None:
+			stats.leaves += 1
+			return value
+	actions = manc.get_actions(player)
+	if table is not None:
+		key = manc.position_hash(player)
+		alpha_orig = alpha
+		beta_orig = beta
+		entry = table.probe(key)
+		if entry is not None:
+			t_depth, bound, value, move = entry
+			if t_depth >= depth and not is_root:
+				if bound == EXACT:
+					return value
+				elif bound == LOWER:
+					alpha = max(alpha, value)
+				else:
+					beta = min(beta, value)
+				if alpha >= beta:
+					return value
+			# Try the stored best move first
+			if move in actions and actions[0] != move:
+				actions.remove(move)
+				actions.insert(0, move)
 	best_value = None
 	best_action = -1
-	for action in m_node.get_actions():
-		res_value = alphabeta(m_node.rollout(action), alpha, beta, depth - 1, False)
-		if best_value is None:
-			best_value = res_value
-			if is_root:
-				best_action = action
-		if m_node.player == 1:
-			if res_value > best_value:
+	if depth == 1:
+		best_value, best_action = _frontier(manc, player, actions, alpha, beta, stats, ply + 1)
+	else:
+		for action in actions:
+			undo = manc.play(action, player)
+			res_value = _alphabeta(manc, 2 // player, alpha, beta, depth - 1, False, table, stats, ply + 1)
+			manc.unplay(undo)
+			if best_value is None:
 				best_value = res_value
-				if is_root:
+				best_action = action
+			if player == 1:
+				if res_value > best_value:
+					best_value = res_value
 					best_action = action
-			alpha = max(alpha, best_value)
-		elif m_node.player == 2:
-			if res_value < best_value:
-				if is_root:
+				alpha = max(alpha, best_value)
+			elif player == 2:
+				if res_value < best_value:
 					best_action = action
-				best_value = min(best_value, res_value)
-			beta = min(beta, best_value)
-		# Children can't influence choice at root, don't explore further
-		if alpha >= beta:
-			break
+					best_value = min(best_value, res_value)
+				beta = min(beta, best_value)
+			# Children can't influence choice at root, don't explore further
+			if alpha >= beta:
+				stats.cutoffs += 1
+				break
+	if table is not None:
+		if best_value <= alpha_orig:
+			table.store(key, depth, UPPER, best_value, best_action)
+		elif best_value >= beta_orig:
+			table.store(key, depth, LOWER, best_value, best_action)
+		else:
+			table.store(key, depth, EXACT, best_value, best_action)
 	if is_root:
-		# Back at root node, play out action
-		# alpha_log.info("Playing move {0}. P1 {1} P2 {2}, Board {3}".format(best_action, m_node.manc.p1_store, m_node.manc.p2_store, m_node.manc.board))
-		m_node.play(best_action)
-		alpha_log.info("Alpha-Beta finished with {0} nodes expanded".format(AB_NODES_EXPANDED))
-		AB_NODES_EXPANDED = 0
-		return
+		return best_action
 	else:
 		# Propagate value back up tree
 		return best_value
 
 
+class _SearchAborted(Exception):
+	"""Raised inside the iterative deepening search once its budget has run out"""
+	pass
+
+
+def _frontier(manc: Mancala, player: int, actions: list, alpha, beta, stats: SearchStats, ply: int) -> tuple:
+	"""
+	Scores the children of a node one ply above the depth limit in a single pass. Children at the limit are leaves
+	whatever they hold, with no table or endgame probes, so each is scored straight from the sowing tables by
+	Mancala.reward_after() instead of being played and searched with a call to _alphabeta. Same values, order, cutoffs
+	and counts as the recursion.
+	:param actions: Actions of the node, in search order
+	:param ply: Distance of the children from the root
+	:return: (best value, best action)
+	"""
+	reward_after = manc.reward_after
+	best_value = None
+	best_action = -1
+	for action in actions:
+		value = reward_after(action, player)
+		stats.nodes += 1
+		stats.leaves += 1
+		if best_value is None:
+			best_value = value
+			best_action = action
+		if player == 1:
+			if value > best_value:
+				best_value = value
+				best_action = action
+			if best_value > alpha:
+				alpha = best_value
+		else:
+			if value < best_value:
+				best_value = value
+				best_action = action
+			if best_value < beta:
+				beta = best_value
+		if alpha >= beta:
+			stats.cutoffs += 1
+			break
+	if actions and ply > stats.max_depth:
+		stats.max_depth = ply
+	return best_value, best_action
+
+
+class _DeepeningSearch:
+	"""
+	State shared by one iterative deepening search: budget, killer moves and the history table.
+	"""
+
+	def __init__(self, table: TranspositionTable, max_time, max_nodes, stats: SearchStats = None):
+		self.table = table
+		self.stats = stats if stats is not None else SearchStats()
+		self.deadline = None if max_time is None else time.perf_counter() + max_time
+		self.max_nodes = max_nodes
+		self.nodes = 0
+		self.can_abort = False  # Only set once an iteration has completed, so there is always a move to play
+		self.hit_limit = False  # Whether the depth limit cut off any line, if not deeper searches can't change anything
+		self.killers = []  # Per ply, the two most recent moves that caused a cutoff
+		self.history = [0] * BD_SIZE  # Indexed by pit, pits belong to one player so no need to split by player
+
+	def order(self, actions: list, ply: int, first: int) -> list:
+		"""
+		Orders actions for searching: the hash/principal variation move, then killers, then by history score.
+		:param actions: Legal actions
+		:param ply: Distance from the root
+		:param first: Move to search first, -1 if none
+		:return: Ordered list of actions
+		"""
+		while len(self.killers) <= ply:
+			self.killers.append([-1, -1])
+		killers = self.killers[ply]
+		history = self.history
+		return sorted(actions, key=lambda a: (a != first, a not in killers, -history[a]))
+
+	def cutoff(self, action: int, ply: int, depth: int) -> None:
+		"""Records a move that caused a beta cutoff"""
+		killers = self.killers[ply]
+		if action != killers[0]:
+			killers[1] = killers[0]
+			killers[0] = action
+		self.history[action] += depth * depth
+
+	def search(self, manc: Mancala, player: int, alpha, beta, depth: int, ply: int, pv_move: int = -1):
+		"""
+		Alpha-beta with move ordering, same values as _alphabeta().
+		:return: (value, best action)
+		"""
+		self.nodes += 1
+		if self.can_abort and (self.max_nodes is not None and self.nodes > self.max_nodes or
+		                       self.deadline is not None and self.nodes & 255 == 0 and time.perf_counter() > self.deadline):
+			raise _SearchAborted()
+		stats = self.stats
+		stats.nodes += 1
+		if ply > stats.max_depth:
+			stats.max_depth = ply
+		if manc.is_terminal:
+			stats.leaves += 1
+			return manc.reward(player), -1
+		if ENDGAME is not None and ply > 0:
+			value = ENDGAME.reward(manc, player)
+			if value is not None:
+				stats.leaves += 1
+				return value, -1
+		if depth == 0:
+			self.hit_limit = True
+			stats.leaves += 1
+			return manc.reward(player), -1
+		key = manc.position_hash(player)
+		alpha_orig = alpha
+		beta_orig = beta
+		first = pv_move
+		entry = self.table.probe(key)
+		if entry is not None:
+			t_depth, bound, value, move = entry
+			if t_depth >= depth and ply > 0:
+				if t_depth != SOLVED:
+					# The stored search was cut off by its depth limit, so using it counts as reaching the limit here
+					self.hit_limit = True
+				if bound == EXACT:
+					return value, move
+				elif bound == LOWER:
+					alpha = max(alpha, value)
+				else:
+					beta = min(beta, value)
+				if alpha >= beta:
+					return value, move
+			if first == -1:
+				first = move
+		# Whether this subtree reaches the depth limit, tracked apart from the rest of the search
+		outer_hit_limit = self.hit_limit
+		self.hit_limit = False
+		best_value = None
+		best_action = -1
+		for action in self.order(manc.get_actions(player), ply, first):
+			undo = manc.play(action, player)
+			try:
+				res_value = self.search(manc, 2 // player, alpha, beta, depth - 1, ply + 1)[0]
+			finally:
+				manc.unplay(undo)
+			if best_value is None or player == 1 and res_value > best_value or player == 2 and res_value < best_value:
+				best_value = res_value
+				best_action = action
+			if player == 1:
+				alpha = max(alpha, best_value)
+			else:
+				beta = min(beta, best_value)
+			if alpha >= beta:
+				self.cutoff(action, ply, depth)
+				stats.cutoffs += 1
+				break
+		t_depth = depth if self.hit_limit else SOLVED
+		self.hit_limit = self.hit_limit or outer_hit_limit
+		if best_value <= alpha_orig:
+			self.table.store(key, t_depth, UPPER, best_value, best_action)
+		elif best_value >= beta_orig:
+			self.table.store(key, t_depth, LOWER, best_value, best_action)
+		else:
+			self.table.store(key, t_depth, EXACT, best_value, best_action)
+		return best_value, best_action
+
+
+def iterative_alphabeta(m_node: Node, max_time: float = None, max_nodes: int = None, max_depth: int = MOVE_LIMIT,
+                        table: TranspositionTable = None, stats: SearchStats = None) -> int:
+	"""
+	Iterative deepening Alpha-Beta Minimax. Searches depth 1, 2, 3... until the time or node budget runs out and plays
+	the best move of the last completed depth. Depth 1 always completes, so a move is always played.
+	Moves are ordered by the previous iteration's principal variation, killer moves and a history table.
+	:param m_node: Node to play a move for
+	:param max_time: Wall-clock budget in seconds, None for no limit
+	:param max_nodes: Node budget, None for no limit
+	:param max_depth: Deepest iteration to search
+	:param table: Optional transposition table, one is created for the move if not given. It can be kept between moves.
+	:param stats: Optional SearchStats to add this search's counts to
+	:return: Depth of the last completed iteration, 0 for a book move
+	"""
+	if _play_book(m_node):
+		return 0
+	if table is None:
+		table = TranspositionTable(1 << 16)
+	if stats is None:
+		stats = SearchStats()
+	ctx = _DeepeningSearch(table, max_time, max_nodes, stats)
+	stats.start(table)
+	best_action = -1
+	completed = 0
+	for depth in range(1, max_depth + 1):
+		ctx.hit_limit = False
+		try:
+			value, best_action = ctx.search(m_node.manc, m_node.player, NEG_INF, POS_INF, depth, 0, best_action)
+		except _SearchAborted:
+			break
+		completed = depth
+		ctx.can_abort = True
+		# alpha_log.debug("Depth {0} finished, value {1}, move {2}".format(depth, value, best_action))
+		if not ctx.hit_limit:
+			# Whole game tree was searched
+			break
+	stats.stop()
+	m_node.play(best_action)
+	alpha_log.info("Iterative deepening reached depth %d: %s", completed, stats)
+	return completed
+
+
 # ******************************************************************************
 # * UCT
 # ******************************************************************************
@@ -122,41 +417,97 @@ def default_policy(n: Node) -> float:
 	:param n: Node to be simulated from
 	:return: Resulting reward
 	"""
-	m = Node.copy_node(n)
-	global UCT_NODES_EXPANDED
-	UCT_NODES_EXPANDED += 1
-	while not m.leaf:
-		random_agent(m)
-	if m.manc.p1_store > m.manc.p2_store:
+	manc, player, score = _simulate(n, ENDGAME.final_score if ENDGAME is not None else None)
+	if score is not None:
+		return 1 if score > 0 else 0.5 if score == 0 else 0
+	if manc.p1_store > manc.p2_store:
 		return 1
-	elif m.manc.p1_store == m.manc.p2_store:
+	elif manc.p1_store == manc.p2_store:
 		return 0.5
 	else:
 		return 0
 
 
 def heuristic_policy(n: Node) -> float:
-	m = Node.copy_node(n)
-	global UCT_NODES_EXPANDED
-	UCT_NODES_EXPANDED += 1
-	while not m.leaf:
-		random_agent(m)
-	return m.reward()
+	manc, player, value = _simulate(n, ENDGAME.reward if ENDGAME is not None else None)
+	if value is not None:
+		return value
+	return manc.reward(player)
+
+
+def _simulate(n: Node, probe) -> tuple:
+	"""
+	Plays random moves from the node to the end of the game, the same moves random_agent() would make. Moves are played
+	on a copy of the game alone, no nodes are made for the positions passed through.
+	:param n: Node to be simulated from
+	:param probe: Endgame database lookup taking (game, player) that ends the simulation if it returns a value, or None
+	:return: (game, player to move, value found by the probe or None)
+	"""
+	manc = n.manc.copy()
+	player = n.player
+	while not manc.is_terminal:
+		if probe is not None:
+			value = probe(manc, player)
+			if value is not None:
+				return manc, player, value
+		actions = manc.get_actions(player)
+		manc.play(actions[randint(0, len(actions) - 1)], player)
+		player = 2 // player
+	return manc, player, None
+
+
+def batch_policy(n: Node, policy: int, rollouts: int, rng=None) -> float:
+	"""
+	Simulates several games from the node at once with the vectorized rules in batch.py, needs NumPy.
+	:param n: Node to be simulated from
+	:param policy: 0 for default_policy results, otherwise heuristic_policy results
+	:param rollouts: Number of games to simulate
+	:param rng: NumPy random generator
+	:return: Sum of the resulting rewards
+	"""
+	import batch
+	return float(batch.rollout(n.manc, n.player, rollouts, policy, rng).sum())
 
 
-def back_propagate(n: Node, delta: float) -> None:
+def back_propagate(n: Node, delta: float, visits: int = 1) -> None:
 	"""
 	Backpropagates rollout policy results back up the tree
 	:param n: Node to backpropagate from
 	:param delta: Delta reward, i.e. "how much success"
+	:param visits: Number of simulations delta is the total of
 	:return: None
 	"""
 	while n is not None:
-		n.visits += 1
+		n.visits += visits
 		n.tot_reward += delta
 		n = n.parent
 
 
+def virtual_loss(n: Node, visits: int) -> None:
+	"""
+	Adds visits without any reward to n and its ancestors, making the path look worse to other selections that happen
+	before the real results are back propagated. Call again with a negative count to take it back off.
+	:param n: Node selected for simulation
+	:param visits: Number of virtual visits, negative to remove them
+	:return: None
+	"""
+	while n is not None:
+		n.visits += visits
+		n = n.parent
+
+
+def ucb1(tot_reward: float, visits: int, parent_visits: int, c: float) -> float:
+	"""
+	UCB1 value of a child
+	:param tot_reward: Total reward of the child
+	:param visits: Visits to the child
+	:param parent_visits: Visits to the parent
+	:param c: Constant for UCB1
+	:return: UCB1 value
+	"""
+	return tot_reward / visits + c * sqrt(2)/2 * sqrt(log(parent_visits / visits))
+
+
 def best_uct_child(n: Node, c: float) -> Node:
 	"""
 	Calculates best UCT bound for children
@@ -167,7 +518,7 @@ def best_uct_child(n: Node, c: float) -> Node:
 	best = NEG_INF
 	max_child = n.children[0]
 	for i in n.children:
-		res = i.tot_reward / i.visits + c * sqrt(2)/2 * sqrt(log(n.visits / i.visits))
+		res = ucb1(i.tot_reward, i.visits, n.visits, c)
 		if res > best:
 			best = res
 			max_child = i
@@ -209,37 +560,145 @@ def tree_policy(n: Node, constant) -> Node:
 	return n
 
 
-def uct(m_node: Node, constant, limit, policy) -> None:
+def uct(m_node: Node, constant, limit, policy=0, rollouts: int = 1, rng=None, stats: SearchStats = None) -> None:
 	"""
 	Generates an action to choose based on the UCT algorithm.
 	:param m_node: Node to choose action for
 	:param constant: Constant for UCB1
 	:param limit: Max number of expansions
 	:param policy: Policy for reward
+	:param rollouts: Simulations per expansion. Above 1 these are run together by the NumPy batch engine
+	:param rng: NumPy random generator for batched simulations
+	:param stats: Optional SearchStats to add this search's counts to
 	:return: Action
 	"""
-	global UCT_NODES_EXPANDED
+	if _play_book(m_node):
+		return
+	uct_search(m_node, constant, limit, policy, rollouts, rng, stats)
+	# should return an action, maybe have it play instead? or helper
+	m_node.play(best_uct_child(m_node, constant).action)
+
+
+def uct_search(m_node: Node, constant, limit, policy=0, rollouts: int = 1, rng=None, stats: SearchStats = None) -> None:
+	"""
+	Grows the UCT tree under m_node without playing a move, see uct() for the parameters.
+	"""
+	if stats is None:
+		stats = SearchStats()
+	stats.start()
 	i = 0
 	# uct_log.info("----- UCT Agent Playing -----")
 	while i < limit:
 		# uct_log.debug("uct: m_node has untried actions {0}".format(m_node.untried_actions))
 		# uct_log.debug("uct: m_node has children {0}".format([x for x in m_node.children]))
 		n1 = tree_policy(m_node, constant)  # UCT Algorithm
-		if policy == 0:
+		if n1.visits == 0 and n1 is not m_node:
+			# Just expanded
+			stats.nodes += 1
+		depth = 0
+		n = n1
+		while n is not m_node:
+			depth += 1
+			n = n.parent
+		if depth > stats.max_depth:
+			stats.max_depth = depth
+		stats.leaves += rollouts
+		if rollouts > 1:
+			delta = batch_policy(n1, policy, rollouts, rng)  # Simulate many random games at once
+		elif policy == 0:
 			delta = default_policy(n1)  # Simulate random game
 		else:
 			delta = heuristic_policy(n1)
-		back_propagate(n1, delta)  # Push results back up tree
+		back_propagate(n1, delta, rollouts)  # Push results back up tree
 		i += 1
-	# should return an action, maybe have it play instead? or helper
-	m_node.play(best_uct_child(m_node, constant).action)
-	# uct_log.info("Expanded {0} nodes".format(UCT_NODES_EXPANDED))
-	UCT_NODES_EXPANDED = 0
+	stats.stop()
+	uct_log.info("UCT finished: %s", stats)
 
 
 # uct_log.info("----- UCT Agent Finished -----")
 
 
+def _discard(n: Node) -> None:
+	"""
+	Breaks the parent/child references of a subtree so it is freed straight away instead of waiting for the cycle
+	collector.
+	:param n: Root of the subtree to discard
+	:return: None
+	"""
+	stack = [n]
+	while stack:
+		n = stack.pop()
+		stack.extend(n.children)
+		n.children = []
+		n.parent = None
+
+
+class UCTAgent:
+	"""
+	UCT that keeps its tree between turns. After its own move and the opponent's reply the search continues from the
+	matching grandchild of the previous root, keeping its visits and rewards, and the rest of the tree is dropped.
+	"""
+
+	def __init__(self, constant, limit, policy=0, rollouts: int = 1, rng=None):
+		"""
+		Parameters are the same as for uct().
+		"""
+		self.constant = constant
+		self.limit = limit
+		self.policy = policy
+		self.rollouts = rollouts
+		self.rng = rng
+		self.root = None  # Tree root, the position after this agent's last move
+		self.reused = 0  # Number of moves that started from a kept subtree
+
+	def reset(self) -> None:
+		"""Drops the tree, call between games"""
+		if self.root is not None:
+			_discard(self.root)
+		self.root = None
+
+	def _reroot(self, m_node: Node) -> Node:
+		"""
+		Finds the node in the kept tree for the game's current position, or starts a new tree.
+		:param m_node: Node of the game being played
+		:return: Root to search from
+		"""
+		old = self.root
+		self.root = None
+		if old is not None:
+			manc = m_node.manc
+			for child in old.children:
+				if child.player == m_node.player and child.manc.hash == manc.hash and \
+						child.manc.num_moves == manc.num_moves and child.manc.board == manc.board:
+					old.children.remove(child)
+					child.parent = None
+					_discard(old)
+					self.reused += 1
+					return child
+			_discard(old)
+		return Node(m_node.manc.copy(), m_node.player)
+
+	def __call__(self, m_node: Node, stats: SearchStats = None) -> None:
+		"""
+		Plays a move for the node.
+		:param m_node: Node to choose action for
+		:param stats: Optional SearchStats to add this search's counts to
+		:return: None
+		"""
+		if _play_book(m_node):
+			self.reset()
+			return
+		root = self._reroot(m_node)
+		uct_search(root, self.constant, self.limit, self.policy, self.rollouts, self.rng, stats)
+		best = best_uct_child(root, self.constant)
+		m_node.play(best.action)
+		# Keep only the subtree of the move played
+		root.children.remove(best)
+		best.parent = None
+		_discard(root)
+		self.root = best
+
+
 # ******************************************************************************
 # * FSSS-Minimax
 # ******************************************************************************
@@ -248,21 +707,40 @@ def uct(m_node: Node, constant, limit, policy) -> None:
 # <G, A, S, T>: Graph, Actions, States, Transition
 
 
-def traverse(state: Node, alpha: float, beta: float) -> tuple:
+def _fsss_child(state: Node, action: int) -> Node:
+	"""
+	Creates the child reached by action. The child shares the parent's game rather than holding a copy, search() plays
+	and unplays moves on it so that it is in the right position whenever a node is being looked at.
+	:param state: Parent node, its game must be in the parent's position
+	:param action: Action to play
+	:return: Child node
+	"""
+	undo = state.manc.play(action, state.player)
+	child = Node(state.manc, 2 // state.player, state.depth + 1, None, state.manc.is_terminal)
+	if ENDGAME is not None and ENDGAME.value(state.manc, child.player) is not None:
+		# Covered by the endgame database, search() scores it from there
+		child.leaf = True
+	state.manc.unplay(undo)
+	child.action = action
+	return child
+
+
+def traverse(state: Node, alpha: float, beta: float, stats: SearchStats = None) -> tuple:
 	"""
 	Selects which node to expand for search
 	:param state: Current node to select action of
 	:param alpha: Alpha
 	:param beta: Beta
+	:param stats: Optional SearchStats to count new children in
 	:return: tuple
 	"""
-	global FS_NODES_EXPANDED
 	assert (state.player == 1 or state.player == 2)
 	# fs_log.debug("Traversing node {0} as player {1}".format(state, state.player))
 	for i in state.get_actions():
 		if i not in state.childs.keys():
-			FS_NODES_EXPANDED += 1
-			state.childs[i] = state.rollout(i)
+			if stats is not None:
+				stats.nodes += 1
+			state.childs[i] = _fsss_child(state, i)
 		state.Uprime[i] = min(beta, state.childs[i].U)
 		state.Lprime[i] = max(alpha, state.childs[i].L)
 	aprime = alpha
@@ -296,22 +774,31 @@ def traverse(state: Node, alpha: float, beta: float) -> tuple:
 	return i_star, aprime, bprime
 
 
-def search(state: Node, alpha: float, beta: float, limit: int) -> None:
+def search(state: Node, alpha: float, beta: float, limit: int, stats: SearchStats = None, ply: int = 0) -> None:
 	"""
 	Generates the upper and lower bounds U and L for the node
 	:param state: Node to search
 	:param alpha: Alpha
 	:param beta: Beta
 	:param limit: Depth limit
+	:param stats: Optional SearchStats to count into
+	:param ply: Distance from the root
 	:return: None
 	"""
 	# fs_log.debug("Searching node {0} as player {1}".format(state, state.player))
+	if stats is not None and ply > stats.max_depth:
+		stats.max_depth = ply
 	if state.leaf or limit == 0:
-		state.L = state.U = state.reward()
+		if stats is not None:
+			stats.leaves += 1
+		value = ENDGAME.reward(state.manc, state.player) if ENDGAME is not None else None
+		state.L = state.U = state.reward() if value is None else value
 		# fs_log.debug("Node is terminal or reaches depth limit, returning reward {0}".format(state.L))
 		return
-	i_star, aprime, bprime = traverse(state, alpha, beta)
-	search(state.childs[i_star], aprime, bprime, limit - 1)
+	i_star, aprime, bprime = traverse(state, alpha, beta, stats)
+	undo = state.manc.play(i_star, state.player)
+	search(state.childs[i_star], aprime, bprime, limit - 1, stats, ply + 1)
+	state.manc.unplay(undo)
 	# fs_log.debug("Finished recursive search, back at node {0}".format(state))
 	# Update state upper and lower bounds
 	actions = state.get_actions()
@@ -331,12 +818,16 @@ def search(state: Node, alpha: float, beta: float, limit: int) -> None:
 	return
 
 
-def fsss(state: Node, limit: int):
-	global FS_NODES_EXPANDED
+def fsss(state: Node, limit: int, stats: SearchStats = None):
+	if _play_book(state):
+		return
+	if stats is None:
+		stats = SearchStats()
+	stats.start()
 	while abs(state.L - state.U) > EPSILON:
 		# fs_log.debug("Searching root node")
-		search(state, NEG_INF, POS_INF, limit)
-	fs_log.info("FSSS finished with {0} nodes expanded".format(FS_NODES_EXPANDED))
-	FS_NODES_EXPANDED = 0
+		search(state, NEG_INF, POS_INF, limit, stats)
+	stats.stop()
+	fs_log.info("FSSS finished: %s", stats)
 	action = max(state.childs.keys(), key=(lambda k: state.childs[k].L))
 	state.play(action)
@@ -0,0 +1,367 @@
+#  Copyright (c) 2019 Owen Siljander
+"""
+Vectorized versions of the Mancala rules for playing many games at once. Boards are (N, BD_SIZE) arrays, stores are
+(N, 2) arrays and players are (N,) arrays of 1 or 2. Results are identical to Mancala.play, Mancala.update_actions and
+Mancala.reward, repeated positions included when play() is given the games' History. MancalaBatch wraps them for
+scoring and playing many positions at once. Requires NumPy.
+"""
+import numpy as np
+
+from mancala import Mancala, BD_SIZE, PITS_PER_ROW, TOTAL_SEEDS, MOVE_LIMIT, REWARD_WEIGHTS, REPEAT_NONE, \
+	REPEAT_OWN, ZOBRIST_PIT, ZOBRIST_STORE, ZOBRIST_P2
+
+PITS = np.arange(BD_SIZE)
+WEIGHTS = np.array(REWARD_WEIGHTS)
+Z_PIT = np.array(ZOBRIST_PIT, dtype=np.uint64)
+Z_STORE = np.array(ZOBRIST_STORE, dtype=np.uint64)
+Z_P2 = np.uint64(ZOBRIST_P2)
+
+
+def update_legal(board: np.ndarray, player: np.ndarray) -> tuple:
+	"""
+	Vectorized Mancala.update_actions.
+	:param board: (N, BD_SIZE) boards
+	:param player: (N,) player to move on each board
+	:return: (legal, terminal). legal is an (N, BD_SIZE) bool array over both rows, terminal is an (N,) bool array.
+	"""
+	half = BD_SIZE // 2
+	nonzero = board != 0
+	p1_movable = nonzero[:, :half].any(axis=1)
+	p2_movable = nonzero[:, half:].any(axis=1)
+	is_p1 = player == 1
+	end = (is_p1 & ~p1_movable) | (~is_p1 & ~p2_movable)
+	legal = nonzero.copy()
+	# Feeding, the player with seeds must play a move that reaches the other row
+	feed = ~p1_movable & p2_movable
+	legal[:, half:] &= ~feed[:, None] | (board[:, half:] + PITS[half:] >= BD_SIZE)
+	feed = ~p2_movable & p1_movable
+	legal[:, :half] &= ~feed[:, None] | (board[:, :half] + PITS[:half] >= half)
+	# Grand slam, opponent's row is a run of 1s and 2s from its first pit followed only by empty pits
+	both = p1_movable & p2_movable
+	opp = np.where(is_p1[:, None], board[:, half:], board[:, :half])
+	opp_nonzero = opp != 0
+	count = opp_nonzero.sum(axis=1)
+	slam_row = both & (np.cumprod(opp_nonzero, axis=1).sum(axis=1) == count) & ~(opp > 2).any(axis=1)
+	target = np.where(is_p1, half, BD_SIZE) + count - 1
+	own = np.where(is_p1[:, None], board[:, :half], board[:, half:])
+	own_pits = np.where(is_p1[:, None], PITS[:half], PITS[half:])
+	own_legal = np.where(is_p1[:, None], legal[:, :half], legal[:, half:])
+	slams = own_legal & (own_pits + own == target[:, None]) & slam_row[:, None]
+	# Grand slams are only removed if the player has another move
+	keep = own_legal & ~(slams & (own_legal & ~slams).any(axis=1)[:, None])
+	legal[:, :half] = np.where(is_p1[:, None], keep, legal[:, :half])
+	legal[:, half:] = np.where(is_p1[:, None], legal[:, half:], keep)
+	return legal, end | ~legal.any(axis=1)
+
+
+def sow(board: np.ndarray, stores: np.ndarray, pit: np.ndarray, player: np.ndarray) -> None:
+	"""
+	Vectorized sowing and capturing of Mancala.play, boards and stores are modified in place.
+	Legality of the moves isn't checked.
+	:param board: (N, BD_SIZE) boards
+	:param stores: (N, 2) stores
+	:param pit: (N,) pit played on each board
+	:param player: (N,) player making each move
+	"""
+	rows = np.arange(board.shape[0])
+	pieces = board[rows, pit]
+	board[rows, pit] = 0
+	laps, rest = np.divmod(pieces, BD_SIZE)
+	dist = (PITS - pit[:, None]) % BD_SIZE
+	board += laps[:, None] + ((dist >= 1) & (dist <= rest[:, None]))
+	# Captures, walking back from the last pit sown while on the opponent's side with 2 or 3 seeds
+	landing = (pit + pieces) % BD_SIZE
+	first = np.where(player == 1, PITS_PER_ROW, 0)
+	running = pieces > 0
+	captured = np.zeros_like(pieces)
+	for k in range(0, PITS_PER_ROW):
+		pos = landing - k
+		running &= (pos >= first) & (pos < first + PITS_PER_ROW)
+		pos %= BD_SIZE
+		v = board[rows, pos]
+		running &= (v == 2) | (v == 3)
+		captured += np.where(running, v, 0)
+		board[rows[running], pos[running]] = 0
+	stores[rows, player - 1] += captured
+
+
+def position_hash(board: np.ndarray, stores: np.ndarray, player: np.ndarray) -> np.ndarray:
+	"""
+	Vectorized Mancala.position_hash.
+	:return: (N,) uint64 array
+	"""
+	h = np.bitwise_xor.reduce(Z_PIT[PITS, board], axis=1) ^ Z_STORE[0, stores[:, 0]] ^ Z_STORE[1, stores[:, 1]]
+	return np.where(player == 2, h ^ Z_P2, h)
+
+
+class History:
+	"""
+	Positions reached since the last capture in each of N games, the vectorized Mancala.seen. Game i's position hashes,
+	with the player to move, are keys[i, :count[i]]. Rows are widened as needed.
+	"""
+
+	def __init__(self, keys: np.ndarray, count: np.ndarray):
+		"""
+		:param keys: (N, capacity) uint64 position hashes
+		:param count: (N,) number of hashes held for each game
+		"""
+		self.keys = keys
+		self.count = count
+
+	@staticmethod
+	def from_seen(seen: list):
+		"""
+		:param seen: Mancala.seen of each game
+		:return: History
+		"""
+		width = max([len(s) for s in seen] + [8])
+		keys = np.zeros((len(seen), width), dtype=np.uint64)
+		for i, s in enumerate(seen):
+			keys[i, :len(s)] = list(s)
+		return History(keys, np.array([len(s) for s in seen], dtype=np.int64))
+
+	def seen(self, i: int) -> dict:
+		"""History of game i as a Mancala.seen"""
+		return {int(k): 1 for k in self.keys[i, :self.count[i]]}
+
+	def select(self, index):
+		"""
+		:param index: Boolean mask or array of indices, indices may repeat
+		:return: New History of the chosen games
+		"""
+		return History(self.keys[index], self.count[index])
+
+	def add(self, key: np.ndarray, captured: np.ndarray) -> np.ndarray:
+		"""
+		Records the position each game has reached, as Mancala.play does.
+		:param key: (N,) position hashes
+		:param captured: (N,) bool, a capture was made, which starts a new history
+		:return: (N,) bool, the position was already in the history. It isn't added again.
+		"""
+		held = np.arange(self.keys.shape[1]) < self.count[:, None]
+		repeated = ~captured & ((self.keys == key[:, None]) & held).any(axis=1)
+		self.count[captured] = 0
+		new = ~repeated
+		if new.any() and self.count[new].max() == self.keys.shape[1]:
+			self.keys = np.concatenate((self.keys, np.zeros_like(self.keys)), axis=1)
+		rows = np.nonzero(new)[0]
+		self.keys[rows, self.count[rows]] = key[rows]
+		self.count[rows] += 1
+		return repeated
+
+
+def play(board: np.ndarray, stores: np.ndarray, num_moves: np.ndarray, pit: np.ndarray, player: np.ndarray,
+         seen: History = None, repetition: int = REPEAT_NONE) -> tuple:
+	"""
+	Vectorized Mancala.play, including the end of game checks. Arrays are modified in place.
+	:param seen: History of the games, updated in place. Without it repeated positions aren't detected.
+	:param repetition: What a repeated position does, see Mancala.repetition
+	:return: (legal, terminal) for the next player, see update_legal()
+	"""
+	before = stores.sum(axis=1)
+	sow(board, stores, pit, player)
+	num_moves += 1
+	repeated = False
+	if seen is not None:
+		repeated = seen.add(position_hash(board, stores, 3 - player), stores.sum(axis=1) != before)
+		if repetition == REPEAT_NONE:
+			repeated = False
+		elif repetition == REPEAT_OWN and repeated.any():
+			# Each player takes the seeds left on their side
+			stores[repeated, 0] += board[repeated, :PITS_PER_ROW].sum(axis=1)
+			stores[repeated, 1] += board[repeated, PITS_PER_ROW:].sum(axis=1)
+			board[repeated] = 0
+	legal, terminal = update_legal(board, 3 - player)
+	terminal |= repeated | (stores > TOTAL_SEEDS // 2).any(axis=1) | (num_moves > MOVE_LIMIT)
+	return legal, terminal
+
+
+def reward(board: np.ndarray, stores: np.ndarray, player: np.ndarray) -> np.ndarray:
+	"""
+	Vectorized Mancala.reward.
+	:return: (N,) float array
+	"""
+	is_p1 = player == 1
+	own = np.where(is_p1[:, None], board[:, :PITS_PER_ROW], board[:, PITS_PER_ROW:])
+	heuristics = (own[:, 0], own.sum(axis=1), (own != 0).sum(axis=1), np.where(is_p1, stores[:, 0], stores[:, 1]),
+	              np.where(is_p1, stores[:, 1], stores[:, 0]))
+	# Summed in the same order as Mancala.reward so the floats are identical, a matrix product may round differently
+	total = np.zeros(board.shape[0])
+	for h, w in zip(heuristics, WEIGHTS):
+		total += h * w
+	return total
+
+
+class MancalaBatch:
+	"""
+	Many games held in NumPy arrays, each with its own player to move, for scoring and playing positions in bulk with
+	the same results as Mancala. Each game keeps its history and the batch follows one repetition policy, which
+	defaults to Mancala.repetition. The legal moves of finished games aren't meaningful.
+	"""
+
+	def __init__(self, board, stores, player, num_moves=None):
+		"""
+		Games with a history holding only their current position, like games from Mancala.unpack.
+		:param board: (N, BD_SIZE) boards
+		:param stores: (N, 2) stores
+		:param player: (N,) player to move on each board
+		:param num_moves: (N,) moves played so far, defaults to 0
+		"""
+		self.board = np.array(board, dtype=np.int16).reshape(-1, BD_SIZE)
+		self.stores = np.array(stores, dtype=np.int16).reshape(-1, 2)
+		self.player = np.array(player, dtype=np.int16).reshape(-1)
+		if num_moves is None:
+			self.num_moves = np.zeros(len(self.player), dtype=np.int16)
+		else:
+			self.num_moves = np.array(num_moves, dtype=np.int16).reshape(-1)
+		self.legal, self.terminal = update_legal(self.board, self.player)
+		self.repetition = Mancala.repetition
+		keys = np.zeros((len(self.player), 8), dtype=np.uint64)
+		keys[:, 0] = position_hash(self.board, self.stores, self.player)
+		self.seen = History(keys, np.ones(len(self.player), dtype=np.int64))
+
+	def __len__(self):
+		return len(self.player)
+
+	@staticmethod
+	def from_games(games: list, players: list):
+		"""
+		Batch of copies of games, keeping their legal moves, terminal state and history as they are.
+		:param games: List of Mancala
+		:param players: Player to move in each game
+		:return: MancalaBatch
+		:raises ValueError: The games don't all have the same repetition policy
+		"""
+		b = MancalaBatch([m.board for m in games], [(m.p1_store, m.p2_store) for m in games], players,
+		                 [m.num_moves for m in games])
+		b.legal = (np.array([m.legal for m in games], dtype=np.int64)[:, None] >> PITS) & 1 == 1
+		b.terminal = np.array([m.is_terminal for m in games], dtype=bool)
+		policies = set(m.repetition for m in games)
+		if len(policies) > 1:
+			raise ValueError("from_games: Games must share a repetition policy, got {0}".format(sorted(policies)))
+		if policies:
+			b.repetition = policies.pop()
+		b.seen = History.from_seen([m.seen for m in games])
+		return b
+
+	def game(self, i: int) -> Mancala:
+		"""Game i as a Mancala"""
+		m = Mancala.unpack(bytes(self.board[i].tolist() + self.stores[i].tolist()), int(self.player[i]),
+		                   int(self.num_moves[i]))
+		m.is_terminal = bool(self.terminal[i])
+		m.repetition = self.repetition
+		m.seen = self.seen.seen(i)
+		return m
+
+	def select(self, index):
+		"""
+		:param index: Boolean mask or array of indices, indices may repeat
+		:return: New MancalaBatch of the chosen games
+		"""
+		b = MancalaBatch.__new__(MancalaBatch)
+		b.board = self.board[index]
+		b.stores = self.stores[index]
+		b.player = self.player[index]
+		b.num_moves = self.num_moves[index]
+		b.legal = self.legal[index]
+		b.terminal = self.terminal[index]
+		b.repetition = self.repetition
+		b.seen = self.seen.select(index)
+		return b
+
+	def copy(self):
+		return self.select(np.arange(len(self)))
+
+	def own_legal(self) -> np.ndarray:
+		"""(N, PITS_PER_ROW) bool array of the legal moves in the row of the player to move"""
+		return np.where((self.player == 1)[:, None], self.legal[:, :PITS_PER_ROW], self.legal[:, PITS_PER_ROW:])
+
+	def legal_mask(self) -> np.ndarray:
+		"""(N,) array of Mancala.legal_mask for the player to move"""
+		return self.own_legal() @ (1 << np.arange(PITS_PER_ROW))
+
+	def reward(self, player=None) -> np.ndarray:
+		"""
+		Mancala.reward of every game.
+		:param player: Player or (N,) players to score for, defaults to the player to move
+		:return: (N,) float array
+		"""
+		if player is None:
+			player = self.player
+		return reward(self.board, self.stores, np.broadcast_to(np.asarray(player, dtype=np.int16), self.player.shape))
+
+	def play(self, pit) -> None:
+		"""
+		Plays a move in every game, then it is the other player's turn in each.
+		:param pit: Pit to play in every game, or (N,) pits
+		:raises ValueError: A game is over or a move isn't legal for the player to move
+		"""
+		pit = np.broadcast_to(np.asarray(pit, dtype=np.int64), self.player.shape)
+		rows = np.arange(len(self))
+		own = (pit >= (self.player - 1) * PITS_PER_ROW) & (pit < self.player * PITS_PER_ROW)
+		if self.terminal.any() or not own.all() or not self.legal[rows, pit].all():
+			raise ValueError("play: Every game must be going on and every move legal")
+		self.legal, self.terminal = play(self.board, self.stores, self.num_moves, pit, self.player, self.seen,
+		                                 self.repetition)
+		self.player = 3 - self.player
+
+	def children(self) -> tuple:
+		"""
+		Every legal move of every game that isn't over, played in a new batch.
+		:return: (children, parent, pit), the batch of games after each move with the index of the game and pit played
+		"""
+		parent, col = np.nonzero(self.own_legal() & ~self.terminal[:, None])
+		pit = col + (self.player[parent] - 1) * PITS_PER_ROW
+		child = self.select(parent)
+		if len(child):
+			child.play(pit)
+		return child, parent, pit
+
+
+def rollout(manc: Mancala, player: int, n: int, policy: int = 0, rng: np.random.Generator = None) -> np.ndarray:
+	"""
+	Plays n random games from the same position at once, the batched equivalent of default_policy/heuristic_policy.
+	Each game starts with the history of manc and follows its repetition policy.
+	:param manc: Game to simulate from, not modified
+	:param player: Player to move
+	:param n: Number of games
+	:param policy: 0 for win/draw/loss (1, 0.5, 0) from player 1's point of view, otherwise Mancala.reward of the player
+	whose turn it would be in the final position
+	:param rng: NumPy random generator
+	:return: (n,) array of outcomes
+	"""
+	if rng is None:
+		rng = np.random.default_rng()
+	board = np.tile(np.array(manc.board, dtype=np.int16), (n, 1))
+	stores = np.tile(np.array([manc.p1_store, manc.p2_store], dtype=np.int16), (n, 1))
+	num_moves = np.full(n, manc.num_moves, dtype=np.int16)
+	players = np.full(n, player, dtype=np.int16)
+	legal = np.tile((manc.legal >> PITS) & 1 == 1, (n, 1))
+	terminal = np.full(n, manc.is_terminal)
+	seen = None
+	if manc.repetition != REPEAT_NONE:
+		start = History.from_seen([manc.seen])
+		seen = History(np.repeat(start.keys, n, axis=0), np.repeat(start.count, n))
+	games = np.arange(n)  # Index into outcomes of each game still being played
+	outcomes = np.zeros(n)
+	while True:
+		done = games[terminal]
+		if done.size:
+			if policy == 0:
+				outcomes[done] = np.where(stores[terminal, 0] > stores[terminal, 1], 1.0,
+				                          np.where(stores[terminal, 0] == stores[terminal, 1], 0.5, 0.0))
+			else:
+				outcomes[done] = reward(board[terminal], stores[terminal], players[terminal])
+			live = ~terminal
+			games, board, stores, num_moves, players, legal = \
+				games[live], board[live], stores[live], num_moves[live], players[live], legal[live]
+			if seen is not None:
+				seen = seen.select(live)
+		if not games.size:
+			return outcomes
+		# Uniformly random legal move for the player to move
+		own_legal = np.where((players == 1)[:, None], legal[:, :PITS_PER_ROW], legal[:, PITS_PER_ROW:])
+		keys = np.where(own_legal, rng.random(own_legal.shape), -1.0)
+		pit = keys.argmax(axis=1) + (players - 1) * PITS_PER_ROW
+		legal, terminal = play(board, stores, num_moves, pit, players, seen, manc.repetition)
+		players = 3 - players
@@ -0,0 +1,221 @@
+#  Copyright (c) 2019 Owen Siljander
+"""
+Benchmarks in three layers: micro (single game operations), search (agents from a fixed set of positions) and end to
+end (whole games of fixed matchups). Every result is a rate where higher is better. Results can be saved as JSON and
+compared against a saved baseline, any result more than the threshold below its baseline is a regression.
+
+	python bench.py --json baseline.json
+	python bench.py --baseline baseline.json --threshold 0.1
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from random import Random
+
+import algs
+from mancala import Mancala
+from node import Node, NEG_INF, POS_INF
+from stats import SearchStats
+
+LAYERS = ("micro", "search", "e2e")
+POSITION_SEED = 2019
+MATCHUPS = (
+	({"alg": "random"}, {"alg": "random"}),
+	({"alg": "alphabeta", "depth": 2}, {"alg": "uct", "limit": 20}),
+)
+
+
+def positions(count: int = 24, seed: int = POSITION_SEED) -> list:
+	"""
+	Fixed set of positions from random games, spread over the opening, middle and end game.
+	:param count: Number of positions
+	:param seed: Seed of the random games
+	:return: List of (packed game, player to move, number of moves)
+	"""
+	rng = Random(seed)
+	found = []
+	while len(found) < count:
+		m = Mancala()
+		player = 1
+		stop = rng.randrange(0, 80)
+		while not m.is_terminal and m.num_moves < stop:
+			m.play(rng.choice(m.get_actions(player)), player)
+			player = 2 // player
+		if not m.is_terminal:
+			found.append((m.pack(), player, m.num_moves))
+	return found
+
+
+def games(states: list) -> list:
+	"""Unpacks positions from positions()"""
+	return [(Mancala.unpack(state, player, num_moves), player) for state, player, num_moves in states]
+
+
+def measure(fn, repeat: int) -> float:
+	"""
+	Best rate of a benchmark over several runs.
+	:param fn: Function doing some work and returning how many units of work it did
+	:param repeat: Number of runs
+	:return: Units of work per second
+	"""
+	best = 0
+	for _ in range(0, repeat):
+		start = time.perf_counter()
+		work = fn()
+		elapsed = time.perf_counter() - start
+		best = max(best, work / elapsed if elapsed > 0 else float("inf"))
+	return best
+
+
+def micro(states: list, number: int, repeat: int) -> dict:
+	"""Calls per second of the basic game operations"""
+	gs = games(states)
+	nodes = [Node(m, player) for m, player in gs]
+
+	def play():
+		moves = 0
+		for _ in range(0, number):
+			for m, player in gs:
+				for a in m.get_actions(player):
+					m.unplay(m.play(a, player))
+					moves += 1
+		return moves
+
+	def each(op):
+		def fn():
+			for _ in range(0, number):
+				for m, player in gs:
+					op(m, player)
+			return number * len(gs)
+		return fn
+
+	def copy_node():
+		for _ in range(0, number):
+			for n in nodes:
+				Node.copy_node(n)
+		return number * len(nodes)
+
+	def rollout_node():
+		moves = 0
+		for _ in range(0, number):
+			for n in nodes:
+				for a in n.get_actions():
+					n.rollout(a)
+					moves += 1
+		return moves
+
+	return {
+		"micro.play_unplay": measure(play, repeat),
+		"micro.update_actions": measure(each(Mancala.update_actions), repeat),
+		"micro.get_actions": measure(each(Mancala.get_actions), repeat),
+		"micro.remove_slam": measure(each(Mancala._remove_slam), repeat),
+		"micro.reward": measure(each(Mancala.reward), repeat),
+		"micro.copy_node": measure(copy_node, repeat),
+		"micro.rollout_node": measure(rollout_node, repeat),
+	}
+
+
+def search(states: list, depths: tuple, uct_limit: int, repeat: int) -> dict:
+	"""Nodes per second of the searches, iterations per second for UCT"""
+	results = {}
+	for depth in depths:
+		def ab():
+			stats = SearchStats()
+			for m, player in games(states):
+				algs._alphabeta(m, player, NEG_INF, POS_INF, depth, False, None, stats)
+			return stats.nodes
+		results["search.alphabeta_d{0}".format(depth)] = measure(ab, repeat)
+
+	def uct():
+		for m, player in games(states):
+			algs.uct_search(Node(m, player), 1, uct_limit)
+		return uct_limit * len(states)
+	results["search.uct"] = measure(uct, repeat)
+
+	def fsss():
+		stats = SearchStats()
+		for m, player in games(states):
+			n = Node(m, player)
+			while abs(n.L - n.U) > algs.EPSILON:
+				algs.search(n, NEG_INF, POS_INF, depths[0], stats)
+		return stats.nodes
+	results["search.fsss_d{0}".format(depths[0])] = measure(fsss, repeat)
+	return results
+
+
+def e2e(count: int, repeat: int) -> dict:
+	"""Games per second of fixed, seeded matchups"""
+	from tournament import agent_name, play_game
+	results = {}
+	for c1, c2 in MATCHUPS:
+		def fn():
+			for k in range(0, count):
+				play_game((0, k, c1, c2, k))
+			return count
+		results["e2e.{0}_v_{1}".format(agent_name(c1), agent_name(c2))] = measure(fn, repeat)
+	return results
+
+
+def run(layers=LAYERS, quick: bool = False) -> dict:
+	"""
+	Runs the benchmarks.
+	:param layers: Layers to run
+	:param quick: Much less work per benchmark, for checking the suite itself rather than timing
+	:return: Dictionary of benchmark name to rate
+	"""
+	states = positions(4 if quick else 24)
+	repeat = 1 if quick else 3
+	results = {}
+	if "micro" in layers:
+		results.update(micro(states, 1 if quick else 200, repeat))
+	if "search" in layers:
+		results.update(search(states, (2,) if quick else (3, 5), 5 if quick else 200, repeat))
+	if "e2e" in layers:
+		results.update(e2e(1 if quick else 5, repeat))
+	return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+	"""
+	Finds regressions against a baseline. Benchmarks missing from either side are ignored.
+	:param results: Dictionary of benchmark name to rate
+	:param baseline: Same for the baseline
+	:param threshold: Allowed slowdown as a fraction, 0.1 allows results down to 90% of the baseline
+	:return: List of (name, result, baseline) for every regression
+	"""
+	return [(name, results[name], baseline[name]) for name in sorted(results)
+	        if name in baseline and results[name] < baseline[name] * (1 - threshold)]
+
+
+def main(argv=None) -> int:
+	parser = argparse.ArgumentParser(description="Mancala engine and agent benchmarks")
+	parser.add_argument("--layers", nargs="+", choices=LAYERS, default=list(LAYERS), help="Layers to run")
+	parser.add_argument("--json", help="Write the results to this file")
+	parser.add_argument("--baseline", help="Compare against results saved with --json")
+	parser.add_argument("--threshold", type=float, default=0.1, help="Allowed slowdown as a fraction of the baseline")
+	parser.add_argument("--quick", action="store_true", help="Much less work, to check the suite runs")
+	args = parser.parse_args(argv)
+	results = run(args.layers, args.quick)
+	baseline = {}
+	if args.baseline:
+		with open(args.baseline) as f:
+			baseline = json.load(f)["results"]
+	for name, rate in sorted(results.items()):
+		line = "{0:<48}{1:>16.1f}/s".format(name, rate)
+		if name in baseline:
+			line += "{0:>+9.1%}".format(rate / baseline[name] - 1)
+		print(line)
+	if args.json:
+		with open(args.json, "w") as f:
+			json.dump({"python": platform.python_version(), "machine": platform.machine(), "quick": args.quick,
+			           "results": results}, f, indent=2, sort_keys=True)
+	regressions = compare(results, baseline, args.threshold)
+	for name, rate, base in regressions:
+		print("Regression: {0} {1:.1f}/s, baseline {2:.1f}/s".format(name, rate, base), file=sys.stderr)
+	return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,181 @@
+#  Copyright (c) 2019 Owen Siljander
+import argparse
+import mmap
+import os
+import struct
+from multiprocessing import Pool
+
+from algs import _DeepeningSearch
+from mancala import Mancala
+from node import NEG_INF, POS_INF
+from transposition import TranspositionTable
+
+# Opening book layout. A header followed by fixed size entries sorted by position hash, looked up by binary search.
+MAGIC = b"MANCBOOK"
+HEADER = struct.Struct("<8sI4x")  # Magic, number of entries
+ENTRY = struct.Struct("<Qfbb")  # Mancala.position_hash(), score, best move, search depth
+MAX_DEPTH = 127  # Depth is stored in a signed byte
+
+
+class OpeningBook:
+	"""
+	Read-only, memory-mapped opening book written by generate().
+	"""
+
+	def __init__(self, path: str):
+		"""
+		:param path: Book file
+		:raises ValueError: Not an opening book
+		"""
+		with open(path, "rb") as f:
+			self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		magic, self.count = HEADER.unpack_from(self.mm, 0)
+		if magic != MAGIC:
+			raise ValueError("{0} is not an opening book".format(path))
+		self.hits = 0
+
+	def close(self) -> None:
+		"""Unmaps the file"""
+		self.mm.close()
+
+	def __len__(self):
+		return self.count
+
+	def _entry(self, i: int) -> tuple:
+		return ENTRY.unpack_from(self.mm, HEADER.size + i * ENTRY.size)
+
+	def lookup(self, key: int):
+		"""
+		:param key: Mancala.position_hash()
+		:return: (score, move, depth) or None if the position isn't in the book
+		"""
+		lo = 0
+		hi = self.count
+		while lo < hi:
+			mid = (lo + hi) // 2
+			entry = self._entry(mid)
+			if entry[0] < key:
+				lo = mid + 1
+			elif entry[0] > key:
+				hi = mid
+			else:
+				return entry[1:]
+		return None
+
+	def probe(self, manc: Mancala, player: int):
+		"""
+		Book move for a position.
+		:param manc: Game
+		:param player: Player to move
+		:return: Move, or None if the position isn't in the book
+		"""
+		entry = self.lookup(manc.position_hash(player))
+		# A hash collision could give a move that isn't legal here
+		if entry is None or not manc.legal_mask(player) >> entry[1] & 1:
+			return None
+		self.hits += 1
+		return entry[1]
+
+	def entries(self) -> dict:
+		"""All entries, as a dictionary of position hash to (score, move, depth)"""
+		return {e[0]: e[1:] for e in (self._entry(i) for i in range(0, self.count))}
+
+
+def write(path: str, entries: dict) -> None:
+	"""
+	Writes a book, replacing the file in one step so that readers never see a partial book.
+	:param path: Book file
+	:param entries: Dictionary of position hash to (score, move, depth)
+	:return: None
+	"""
+	tmp = path + ".tmp"
+	with open(tmp, "wb") as f:
+		f.write(HEADER.pack(MAGIC, len(entries)))
+		for key in sorted(entries):
+			f.write(ENTRY.pack(key, *entries[key]))
+	os.replace(tmp, path)
+
+
+def positions(plies: int) -> list:
+	"""
+	Every non-terminal position reachable from the initial position in fewer than plies moves, without transpositions.
+	:param plies: Length of the lines covered
+	:return: List of (Mancala, player to move)
+	"""
+	start = Mancala()
+	found = {start.position_hash(1): (start, 1)}
+	frontier = [(start, 1)]
+	for _ in range(1, plies):
+		nxt = []
+		for manc, player in frontier:
+			for a in manc.get_actions(player):
+				m = manc.copy()
+				m.play(a, player)
+				key = m.position_hash(2 // player)
+				if not m.is_terminal and key not in found:
+					found[key] = (m, 2 // player)
+					nxt.append((m, 2 // player))
+		frontier = nxt
+	return list(found.values())
+
+
+def _book_search(args: tuple) -> tuple:
+	"""
+	Worker side of generate(), an iterative deepening search of one position.
+	:param args: (game, player, depth)
+	:return: (position hash, score, move, depth reached)
+	"""
+	manc, player, depth = args
+	ctx = _DeepeningSearch(TranspositionTable(1 << 16), None, None)
+	value = 0
+	move = -1
+	completed = 0
+	for d in range(1, depth + 1):
+		ctx.hit_limit = False
+		value, move = ctx.search(manc, player, NEG_INF, POS_INF, d, 0, move)
+		completed = d
+		if not ctx.hit_limit:
+			# Whole game tree was searched, deeper searches give the same result
+			completed = MAX_DEPTH
+			break
+	return manc.position_hash(player), value, move, completed
+
+
+def generate(path: str, plies: int, depth: int, workers: int = None) -> int:
+	"""
+	Creates or extends an opening book by searching every position of the first plies moves to the given depth.
+	Positions already in the book at least as deep are kept as they are, so a book can be grown with longer lines or
+	deeper searches without redoing earlier work.
+	:param path: Book file, read first if it exists
+	:param plies: Length of the lines covered
+	:param depth: Search depth, at most MAX_DEPTH
+	:param workers: Worker processes, defaults to the number of CPUs
+	:return: Number of positions searched
+	"""
+	if not 1 <= depth <= MAX_DEPTH:
+		raise ValueError("depth must be between 1 and {0}, got {1}".format(MAX_DEPTH, depth))
+	entries = {}
+	if os.path.exists(path):
+		book = OpeningBook(path)
+		entries = book.entries()
+		book.close()
+	jobs = []
+	for manc, player in positions(plies):
+		entry = entries.get(manc.position_hash(player))
+		if entry is None or entry[2] < depth:
+			jobs.append((manc, player, depth))
+	with Pool(workers or os.cpu_count() or 1) as pool:
+		for key, value, move, completed in pool.imap_unordered(_book_search, jobs, chunksize=8):
+			entries[key] = (value, move, completed)
+	write(path, entries)
+	return len(jobs)
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Generate or extend an opening book")
+	parser.add_argument("path", help="Book file, extended if it already exists")
+	parser.add_argument("plies", type=int, help="Length of the lines covered")
+	parser.add_argument("depth", type=int, help="Search depth for each position")
+	parser.add_argument("--workers", type=int, default=None, help="Worker processes, defaults to the number of CPUs")
+	args = parser.parse_args()
+	print("Searched {0} positions".format(generate(args.path, args.plies, args.depth, args.workers)))
@@ -0,0 +1,135 @@
+#  Copyright (c) 2019 Owen Siljander
+"""
+Command line entry point. Agents and the game are only imported by the command that needs them, so starting up stays
+cheap.
+
+	python cli.py match alphabeta:depth=3 uct:limit=500 --games 100 --out results.jsonl
+	python cli.py analyze iterative:max_time=2 --board 4,4,4,4,4,4,4,4,4,4,4,4 --player 1
+	python cli.py bench --quick
+
+Agents are given as an algorithm name with optional parameters, see tournament.ALGORITHMS, or as a JSON object.
+"""
+import argparse
+import ast
+import json
+import os
+import sys
+
+
+def parse_agent(spec: str) -> dict:
+	"""
+	Turns an agent given on the command line into an agent configuration.
+	:param spec: "alg" or "alg:param=value,param=value", or a JSON object
+	:return: Agent configuration
+	"""
+	if spec.startswith("{"):
+		return json.loads(spec)
+	alg, _, params = spec.partition(":")
+	config = {"alg": alg}
+	for param in filter(None, params.split(",")):
+		key, sep, value = param.partition("=")
+		if not sep:
+			raise argparse.ArgumentTypeError("Expected param=value, got {0}".format(param))
+		try:
+			config[key] = ast.literal_eval(value)
+		except (ValueError, SyntaxError):
+			config[key] = value
+	return config
+
+
+def match(args) -> int:
+	from main import add_to_stats
+	from tournament import run, read_results
+	stats = {}
+	# Games already in the results file are from an earlier, interrupted match and won't be played again
+	if os.path.exists(args.out):
+		for r in read_results(args.out):
+			add_to_stats(stats, r)
+		print("Resuming with {0} games already played".format(sum(s.num_games for s in stats.values())))
+	for r in run([args.first, args.second], [(0, 1, args.games)], args.out, args.workers, args.seed, args.log):
+		add_to_stats(stats, r)
+		print("Game {0}: {1} v. {2}, {3}-{4}".format(r["game"], r["p1"], r["p2"], r["p1_store"], r["p2_store"]))
+	for s in stats.values():
+		s.end_stats()
+	return 0
+
+
+def analyze(args) -> int:
+	from mancala import Mancala, BD_SIZE
+	from node import Node
+	from stats import SearchStats
+	from tournament import make_agent
+	if len(args.board) != BD_SIZE or len(args.stores) != 2:
+		print("A board has {0} pits and there are 2 stores".format(BD_SIZE), file=sys.stderr)
+		return 2
+	manc = Mancala.unpack(bytes(args.board + args.stores), args.player, args.moves)
+	if manc.is_terminal:
+		print("Game is over", file=sys.stderr)
+		return 2
+	before = manc.copy()
+	n = Node(manc, args.player)
+	stats = SearchStats()
+	make_agent(args.agent)(n, stats)
+	move = next(a for a in before.get_actions(args.player) if _after(before, a, args.player) == n.manc.pack())
+	print(before)
+	print("Player {0} plays pit {1}".format(args.player, move))
+	print(stats)
+	return 0
+
+
+def _after(manc, action: int, player: int) -> bytes:
+	"""Packed game after playing an action on a copy"""
+	m = manc.copy()
+	m.play(action, player)
+	return m.pack()
+
+
+def bench(args) -> int:
+	import bench as b
+	return b.main(args.args)
+
+
+def ints(value: str) -> list:
+	return [int(x) for x in value.split(",")]
+
+
+def main(argv=None) -> int:
+	parser = argparse.ArgumentParser(description="Mancala agents")
+	parser.add_argument("--log", action="store_true", help="Log to a file per process")
+	parser.add_argument("--log-file", default="log.{pid}.log", help="Log file name, {pid} is replaced by the process id")
+	sub = parser.add_subparsers(dest="command", required=True)
+
+	p = sub.add_parser("match", help="Play games between two agents on all cores")
+	p.add_argument("first", type=parse_agent, help="Player 1 in the first game, colours alternate")
+	p.add_argument("second", type=parse_agent)
+	p.add_argument("--games", type=int, default=2)
+	p.add_argument("--workers", type=int, default=None, help="Defaults to the number of CPUs")
+	p.add_argument("--seed", type=int, default=0)
+	p.add_argument("--out", default="results.jsonl", help="JSONL results, an interrupted match is resumed")
+	p.set_defaults(func=match)
+
+	p = sub.add_parser("analyze", help="Show the move an agent plays in a position")
+	p.add_argument("agent", type=parse_agent)
+	p.add_argument("--board", type=ints, default=[4] * 12, help="Comma separated pit counts")
+	p.add_argument("--stores", type=ints, default=[0, 0], help="Player 1 and player 2 stores")
+	p.add_argument("--player", type=int, choices=(1, 2), default=1)
+	p.add_argument("--moves", type=int, default=0, help="Moves played so far")
+	p.set_defaults(func=analyze)
+
+	p = sub.add_parser("bench", help="Run the benchmarks, other arguments are passed to bench.py")
+	p.set_defaults(func=bench)
+
+	args, extra = parser.parse_known_args(argv)
+	if extra and args.command != "bench":
+		parser.error("unrecognized arguments: {0}".format(" ".join(extra)))
+	args.args = extra
+	args.log = args.log_file if args.log else None
+	if args.log:
+		import logging
+		from logs import enable_logging
+		enable_logging(args.log, logging.INFO)
+	return args.func(args)
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,367 @@
+#  Copyright (c) 2019 Owen Siljander
+import argparse
+import mmap
+import multiprocessing
+import os
+from array import array
+from math import comb
+
+from mancala import Mancala, BD_SIZE, TOTAL_SEEDS
+
+# Endgame database layout. Positions are grouped by the number of seeds left on the board (the level). Within a level a
+# position is (headroom, player, board) where headroom is 24 - p1_store, which with the seed count fixes both stores.
+# Boards are ranked with the combinatorial number system. Every position holds one signed byte: the difference in
+# seeds captured by player 1 and player 2 from that position to the end of the game under optimal play.
+MAGIC = b"AWARIDB1"
+HEADER_SIZE = 16  # Magic, max seeds, levels done, padding
+WIN_STORE = TOTAL_SEEDS // 2  # A store above this ends the game
+# Largest max_seeds build() accepts. Solving a level takes about 55 bytes of memory per position, some 2GB for level 12,
+# and each further seed roughly doubles both that and the time. Position indices are also kept as 32-bit ints. The file
+# format itself stops at WIN_STORE, above which both stores can't be at or below WIN_STORE.
+MAX_BUILD_SEEDS = 12
+BARS = BD_SIZE - 1
+BINOM = [[comb(n, k) for k in range(0, BD_SIZE + 1)] for n in range(0, TOTAL_SEEDS + BD_SIZE + 1)]
+
+
+def level_size(n: int) -> int:
+	"""Number of distinct boards with n seeds"""
+	return BINOM[n + BARS][BARS]
+
+
+def level_positions(n: int) -> int:
+	"""Number of positions stored for level n, every board with every headroom and player"""
+	return level_size(n) * (n + 1) * 2
+
+
+def level_offset(n: int) -> int:
+	"""Offset of level n from the start of the data"""
+	return sum(level_positions(m) for m in range(0, n))
+
+
+def rank(board) -> int:
+	"""
+	Index of a board among all boards with the same number of seeds. Pit counts are turned into the positions of the
+	BD_SIZE - 1 bars in a stars and bars layout, which are ranked in colex order.
+	:param board: Pit counts
+	:return: Rank
+	"""
+	r = 0
+	q = -1
+	for k in range(0, BARS):
+		q += board[k] + 1
+		r += BINOM[q][k + 1]
+	return r
+
+
+def unrank(r: int, n: int) -> list:
+	"""
+	Inverse of rank().
+	:param r: Rank
+	:param n: Seeds on the board
+	:return: Pit counts
+	"""
+	bars = [0] * BARS
+	q = n + BARS
+	for k in range(BARS - 1, -1, -1):
+		q -= 1
+		while BINOM[q][k + 1] > r:
+			q -= 1
+		bars[k] = q
+		r -= BINOM[q][k + 1]
+	board = []
+	prev = -1
+	for q in bars:
+		board.append(q - prev - 1)
+		prev = q
+	board.append(n + BARS - prev - 1)
+	return board
+
+
+def _local_index(board, n: int, headroom: int, player: int) -> int:
+	"""Index of a position within its level"""
+	return (headroom * 2 + player - 1) * level_size(n) + rank(board)
+
+
+class EndgameDB:
+	"""
+	Read-only, memory-mapped endgame database. Probes are a rank computation and a single byte read.
+	"""
+
+	def __init__(self, path: str):
+		"""
+		:param path: Database file written by build()
+		:raises ValueError: Not an endgame database, or one whose build hasn't finished
+		"""
+		with open(path, "rb") as f:
+			self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		header = self.mm[:HEADER_SIZE]
+		if header[:len(MAGIC)] != MAGIC:
+			raise ValueError("{0} is not an endgame database".format(path))
+		self.max_seeds = header[len(MAGIC)]
+		if header[len(MAGIC) + 1] != self.max_seeds + 1:
+			raise ValueError("{0} is incomplete, only {1} levels are built".format(path, header[len(MAGIC) + 1]))
+		self.values = memoryview(self.mm)[HEADER_SIZE:].cast('b')
+		self.offsets = [level_offset(n) for n in range(0, self.max_seeds + 1)]
+		self.hits = 0
+
+	def close(self) -> None:
+		"""Unmaps the file"""
+		self.values.release()
+		self.mm.close()
+
+	def value(self, manc: Mancala, player: int):
+		"""
+		Exact difference in seeds player 1 and player 2 go on to capture from this position.
+		:param manc: Game
+		:param player: Player to move
+		:return: Score difference, or None if the position isn't covered
+		"""
+		n = TOTAL_SEEDS - manc.p1_store - manc.p2_store
+		if n > self.max_seeds:
+			return None
+		if manc.is_terminal:
+			return 0
+		headroom = WIN_STORE - manc.p1_store
+		if not 0 <= headroom <= n or sum(manc.board) != n:
+			return None
+		self.hits += 1
+		return self.values[self.offsets[n] + _local_index(manc.board, n, headroom, player)]
+
+	def final_score(self, manc: Mancala, player: int):
+		"""
+		Final p1_store - p2_store under optimal play.
+		:return: Score difference, or None if the position isn't covered
+		"""
+		v = self.value(manc, player)
+		return None if v is None else manc.plain_reward() + v
+
+	def reward(self, manc: Mancala, player: int):
+		"""
+		Mancala.reward of the position once the endgame has been played out, for searches that compare positions by
+		reward. Stores are set to their final difference using the fewest captures, the board is left as it is.
+		:return: Reward, or None if the position isn't covered
+		"""
+		v = self.value(manc, player)
+		if v is None:
+			return None
+		m = manc.copy()
+		m.p1_store += max(v, 0)
+		m.p2_store += max(-v, 0)
+		return m.reward(player)
+
+
+# ******************************************************************************
+# * Builder
+# ******************************************************************************
+
+def _level_moves(args: tuple) -> tuple:
+	"""
+	Generates the moves of a range of positions in a level.
+	:param args: (path, level, first local index, last local index)
+	:return: (terminal flags, move counts, successors, exit values). Each move is either a successor index within the
+	level, or -1 with the score difference of leaving the level through it in exits.
+	"""
+	path, n, lo, hi = args
+	with open(path, "rb") as f:
+		mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+	lower = memoryview(mm)[HEADER_SIZE:].cast('b')
+	size = level_size(n)
+	offsets = [level_offset(k) for k in range(0, n)]
+	boards = {}  # Unranked boards, each comes up once per headroom and player
+	terminal = bytearray(hi - lo)
+	counts = bytearray(hi - lo)
+	succ = array('i')
+	exits = array('b')
+	for i in range(lo, hi):
+		which, r = divmod(i, size)
+		headroom, player = divmod(which, 2)
+		player += 1
+		p1 = WIN_STORE - headroom
+		board = boards.get(r)
+		if board is None:
+			board = boards[r] = bytes(unrank(r, n))
+		m = Mancala.unpack(board + bytes((p1, TOTAL_SEEDS - n - p1)), player)
+		if m.is_terminal:
+			terminal[i - lo] = 1
+			continue
+		sign = 1 if player == 1 else -1
+		actions = m.get_actions(player)
+		counts[i - lo] = len(actions)
+		for a in actions:
+			undo = m.play(a, player)
+			captured = m.p1_store - p1 if player == 1 else m.p2_store - (TOTAL_SEEDS - n - p1)
+			if m.is_terminal:
+				succ.append(-1)
+				exits.append(sign * captured)
+			elif captured:
+				k = n - captured
+				succ.append(-1)
+				exits.append(sign * captured + lower[offsets[k] + _local_index(m.board, k, WIN_STORE - m.p1_store,
+				                                                               2 // player)])
+			else:
+				succ.append(_local_index(m.board, n, headroom, 2 // player))
+				exits.append(0)
+			m.unplay(undo)
+	lower.release()
+	mm.close()
+	return terminal, counts, succ, exits
+
+
+def _sweep(graph: tuple, values, attacker: int) -> None:
+	"""
+	Fills in the values of the current level on one side of zero with a single retrograde pass.
+	Endless play within the level captures nothing, so for v > 0 the difference is at least v exactly where player 1 can
+	force an exit worth at least v, player 1's attractor to those exits. These sets only grow as v goes down, so v is
+	taken from n down to 1, each step adding the exits worth v as targets and carrying on the successor counting from
+	where the previous step left off. A position first reached at step v has value v. Values of -n to -1 are found the
+	same way as player 2's attractor to exits worth at most v, with v going up. Positions reached by neither are 0.
+	:param graph: (level, terminal flags, move starts, successors, exit values, predecessor starts, predecessors)
+	:param values: One signed byte per position, filled in for the positions reached
+	:param attacker: 1 for the positive values, 2 for the negative ones
+	:return: None
+	"""
+	n, terminal, start, succ, exits, pred_start, preds = graph
+	size = level_size(n)
+	total = len(terminal)
+	steps = range(n, 0, -1) if attacker == 1 else range(-n, 0)
+	# Positions leaving the level by an exit of each value, once per exit
+	targets = {v: array('i') for v in steps}
+	# Moves of each defender position not yet known to lead to a target
+	remaining = bytearray(total)
+	for i in range(0, total):
+		if terminal[i]:
+			continue
+		remaining[i] = start[i + 1] - start[i]
+		for k in range(start[i], start[i + 1]):
+			if succ[k] == -1 and exits[k] in targets:
+				targets[exits[k]].append(i)
+	reached = bytearray(total)
+	for v in steps:
+		queue = []
+		for i in targets.pop(v):
+			if reached[i]:
+				continue
+			if (i // size) % 2 + 1 == attacker:
+				reached[i] = 1
+				queue.append(i)
+			else:
+				remaining[i] -= 1
+				if remaining[i] == 0:
+					reached[i] = 1
+					queue.append(i)
+		while queue:
+			j = queue.pop()
+			values[j] = v
+			for k in range(pred_start[j], pred_start[j + 1]):
+				i = preds[k]
+				if reached[i]:
+					continue
+				if (i // size) % 2 + 1 == attacker:
+					reached[i] = 1
+					queue.append(i)
+				else:
+					remaining[i] -= 1
+					if remaining[i] == 0:
+						reached[i] = 1
+						queue.append(i)
+
+
+def _pool(workers: int):
+	"""Process pool sharing the parent's memory, None to run in this process"""
+	if workers > 1 and "fork" in multiprocessing.get_all_start_methods():
+		return multiprocessing.get_context("fork").Pool(workers)
+	return None
+
+
+def _solve_level(path: str, n: int, workers: int) -> bytes:
+	"""
+	Solves one level, all lower levels must already be in the file.
+	:return: Values of the level's positions, one signed byte each
+	"""
+	total = level_positions(n)
+	chunk = max(1, -(-total // (workers * 4)))
+	jobs = [(path, n, lo, min(total, lo + chunk)) for lo in range(0, total, chunk)]
+	pool = _pool(workers)
+	parts = pool.map(_level_moves, jobs) if pool else [_level_moves(x) for x in jobs]
+	if pool:
+		pool.close()
+		pool.join()
+	terminal = bytearray()
+	start = array('i', [0])
+	succ = array('i')
+	exits = array('b')
+	for t, counts, s, e in parts:
+		terminal += t
+		for c in counts:
+			start.append(start[-1] + c)
+		succ += s
+		exits += e
+	# Predecessor lists for moves that stay within the level
+	pred_start = array('i', [0]) * (total + 1)
+	for j in succ:
+		if j != -1:
+			pred_start[j + 1] += 1
+	for j in range(0, total):
+		pred_start[j + 1] += pred_start[j]
+	fill = array('i', pred_start)
+	preds = array('i', [0]) * pred_start[total]
+	for i in range(0, total):
+		for k in range(start[i], start[i + 1]):
+			j = succ[k]
+			if j != -1:
+				preds[fill[j]] = i
+				fill[j] += 1
+	del fill
+	graph = (n, terminal, start, succ, exits, pred_start, preds)
+	values = array('b', bytes(total))
+	_sweep(graph, values, 1)
+	_sweep(graph, values, 2)
+	return values.tobytes()
+
+
+def build(path: str, max_seeds: int, workers: int = None) -> None:
+	"""
+	Builds the endgame database for every position with at most max_seeds seeds on the board, by retrograde analysis
+	under the rules of Mancala.play and Mancala.update_actions. The move limit isn't modelled, endless play simply
+	captures nothing more. Levels are written as they are finished, rerunning an interrupted build carries on from the
+	first unfinished level.
+	:param path: Output file
+	:param max_seeds: Largest number of seeds on the board to cover, at most MAX_BUILD_SEEDS
+	:param workers: Worker processes, defaults to the number of CPUs
+	:return: None
+	"""
+	if not 0 <= max_seeds <= MAX_BUILD_SEEDS:
+		raise ValueError("max_seeds must be between 0 and {0}, got {1}".format(MAX_BUILD_SEEDS, max_seeds))
+	workers = workers or os.cpu_count() or 1
+	size = HEADER_SIZE + level_offset(max_seeds + 1)
+	done = 0
+	if os.path.exists(path):
+		with open(path, "rb") as f:
+			header = f.read(HEADER_SIZE)
+		if header[:len(MAGIC)] != MAGIC or header[len(MAGIC)] != max_seeds:
+			raise ValueError("{0} exists and is not a {1} seed endgame database".format(path, max_seeds))
+		done = header[len(MAGIC) + 1]
+	else:
+		with open(path, "wb") as f:
+			f.write(MAGIC + bytes((max_seeds, 0)) + bytes(HEADER_SIZE - len(MAGIC) - 2))
+			f.truncate(size)
+	for n in range(done, max_seeds + 1):
+		values = _solve_level(path, n, workers)
+		with open(path, "r+b") as f:
+			f.seek(HEADER_SIZE + level_offset(n))
+			f.write(values)
+			f.flush()
+			os.fsync(f.fileno())
+			# Only mark the level as done once its values are on disk
+			f.seek(len(MAGIC) + 1)
+			f.write(bytes((n + 1,)))
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Build an Awari endgame database")
+	parser.add_argument("path", help="Output file, an unfinished build at this path is resumed")
+	parser.add_argument("max_seeds", type=int,
+	                    help="Largest number of seeds on the board to cover, at most {0}".format(MAX_BUILD_SEEDS))
+	parser.add_argument("--workers", type=int, default=None, help="Worker processes, defaults to the number of CPUs")
+	args = parser.parse_args()
+	build(args.path, args.max_seeds, args.workers)
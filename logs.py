@@ -0,0 +1,26 @@
+#  Copyright (c) 2019 Owen Siljander
+import logging
+import os
+
+FORMAT = "%(asctime)s [%(levelname)s]:%(name)s - %(message)s"
+
+
+def enable_logging(path: str = "log.{pid}.log", level: int = logging.INFO) -> str:
+	"""
+	Sends the agents' logging to a file for this process. Nothing is logged until this is called. Pass it as a pool
+	initializer to give every worker its own file, handlers inherited from a forked parent are replaced rather than
+	shared.
+	:param path: File name, {pid} is replaced by the process id
+	:param level: Logging level
+	:return: Name of the file written to
+	"""
+	path = path.format(pid=os.getpid())
+	root = logging.getLogger()
+	for handler in list(root.handlers):
+		root.removeHandler(handler)
+		handler.close()
+	handler = logging.FileHandler(path, mode="w")
+	handler.setFormatter(logging.Formatter(FORMAT))
+	root.addHandler(handler)
+	root.setLevel(level)
+	return path
@@ -1,22 +1,23 @@
 #  Copyright (c) 2019 Owen Siljander
+import logging
+import os
 import time
 
-from algs import *
+from algs import alphabeta, uct, fsss, random_agent
+from logs import enable_logging
 from mancala import Mancala
-from node import Node
+from node import Node, NEG_INF, POS_INF
+from stats import SearchStats, LatencyHistogram, PHASES, game_phase
+from tournament import round_robin, run, read_results
 
-# logging imported from algs.py
-config = "%(asctime)s [%(levelname)s]:%(name)s - %(message)s"
-logging.basicConfig(format=config, filename='log.log', level=logging.DEBUG, filemode="w")
 main_log = logging.getLogger("main")
-main_log.setLevel(logging.INFO)
-# main_log.disabled = True
 
 NUM_GAMES = 1
 
 
 def cur_time():
-	return int(round(time.time() * 1000))
+	# Milliseconds on a monotonic clock, only differences are meaningful
+	return time.perf_counter_ns() / 1e6
 
 
 class Measure:
@@ -35,6 +36,9 @@ class Measure:
 		self.p1_wins = 0
 		self.p2_wins = 0
 		self.draws = 0
+		self.p1_stats = SearchStats()  # Search counts of each side, from tournament results
+		self.p2_stats = SearchStats()
+		self.latency = {}  # Agent name to game phase to LatencyHistogram of its moves
 
 	def __repr__(self):
 		if self.num_games == 0:
@@ -50,6 +54,13 @@ class Measure:
 		r += "Player 1 won {0} time(s), Player 2 won {1} time(s), there were {2} draw(s)".format(self.p1_wins,
 		                                                                                         self.p2_wins,
 		                                                                                         self.draws)
+		if self.p1_stats.searches or self.p2_stats.searches:
+			r += "\nPlayer 1 searches: {0}\nPlayer 2 searches: {1}".format(self.p1_stats, self.p2_stats)
+		for agent in sorted(self.latency):
+			r += "\n{0} move latency:".format(agent)
+			for phase in PHASES + ("all",):
+				if phase in self.latency[agent]:
+					r += "\n  {0:<11}{1}".format(phase, self.latency[agent][phase])
 		return r
 
 	def avg(self, x):
@@ -58,6 +69,23 @@ class Measure:
 	def start_stats(self):
 		self.start = cur_time()
 
+	def record_move(self, agent: str, seeds: int, ns: int):
+		"""
+		Counts the time an agent took over one move.
+		:param agent: Name of the agent
+		:param seeds: Seeds on the board before the move, gives the game phase
+		:param ns: Time taken in nanoseconds, from time.perf_counter_ns()
+		"""
+		phases = self.latency.setdefault(agent, {})
+		for phase in (game_phase(seeds), "all"):
+			phases.setdefault(phase, LatencyHistogram()).record(ns)
+
+	def _merge_latency(self, agent: str, latency: dict):
+		phases = self.latency.setdefault(agent, {})
+		for phase, h in latency.items():
+			phases.setdefault(phase, LatencyHistogram()).merge(h)
+			phases.setdefault("all", LatencyHistogram()).merge(h)
+
 	def update_stats(self, n: Node):
 		self.num_games += 1
 		self.end = cur_time()
@@ -76,6 +104,28 @@ class Measure:
 		else:
 			self.draws += 1
 
+	def add_result(self, record: dict):
+		"""Counts a game from a tournament result record, see tournament.play_game()"""
+		self.num_games += 1
+		self.tim += record["time_ms"]
+		self.avg += record["moves"]
+		self.min_moves = min(self.min_moves, record["moves"])
+		self.max_moves = max(self.max_moves, record["moves"])
+		self.min_time = min(self.min_time, record["time_ms"])
+		self.max_time = max(self.max_time, record["time_ms"])
+		self.avg_dif += record["reward"]
+		self.p1_stats.merge(record["p1_stats"])
+		self.p2_stats.merge(record["p2_stats"])
+		# Results written before latencies were recorded have none
+		self._merge_latency(record["p1"], record.get("p1_latency", {}))
+		self._merge_latency(record["p2"], record.get("p2_latency", {}))
+		if record["winner"] == 1:
+			self.p1_wins += 1
+		elif record["winner"] == 2:
+			self.p2_wins += 1
+		else:
+			self.draws += 1
+
 	def end_stats(self):
 		print(self)
 
@@ -87,7 +137,6 @@ def alphabeta_uct():
 		# main_log.info("--------------------- GAME STARTED ---------------------")
 		player = 1
 		n = Node(Mancala())
-		n.is_root = True
 		stats.start_stats()
 		try:
 			while not n.leaf:
@@ -183,15 +232,19 @@ def generic():
 		n = Node(Mancala())
 		stats.start_stats()
 		while not n.leaf:
+			seeds = sum(n.manc.board)
+			t = time.perf_counter_ns()
 			if player % 2 == 1:
 				# random_agent(n)
 				alphabeta(n, NEG_INF, POS_INF, depth, True)
 				# fsss(n, depth)
 				# uct(n, 1, 25, 1)
+				stats.record_move("Alpha-Beta", seeds, time.perf_counter_ns() - t)
 			else:
 				# alphabeta(n, NEG_INF, POS_INF, depth2, True)
 				# uct(n, 1, depth2, 1)
 				uct(n, 1, depth2, 0)
+				stats.record_move("UCT", seeds, time.perf_counter_ns() - t)
 			player += 1
 		player = 1
 		# main_log.info("GAME ENDED NOOB")
@@ -201,14 +254,42 @@ def generic():
 	stats.end_stats()
 
 
+def add_to_stats(stats: dict, record: dict) -> None:
+	"""Counts a tournament result in the Measure of its pairing"""
+	pairing = "{0} v. {1}".format(record["p1"], record["p2"])
+	if pairing not in stats:
+		stats[pairing] = Measure(pairing)
+	stats[pairing].add_result(record)
+
+
+def tournament(path: str = "results.jsonl"):
+	# Same sweep as generic(), every configuration against every other on all cores
+	configs = [{"alg": "alphabeta", "depth": depth} for depth in [1, 3, 5]]
+	configs += [{"alg": "uct", "constant": 1, "limit": limit, "policy": 0} for limit in [25, 50, 100]]
+	stats = {}
+	# Results already on disk are from an earlier, interrupted run. Those games won't be played again.
+	if os.path.exists(path):
+		for r in read_results(path):
+			add_to_stats(stats, r)
+		print("Resuming with {0} games already played".format(sum(s.num_games for s in stats.values())))
+	for r in run(configs, round_robin(len(configs), 2 * NUM_GAMES), path):
+		add_to_stats(stats, r)
+		print("Game {0} of pairing {1} finished. Moves: {2}. Winner: Player {3}".format(r["game"], r["pairing"],
+		                                                                                r["moves"], r["winner"]))
+	for s in stats.values():
+		s.end_stats()
+
+
 def main():
 	# alphabeta_uct()
 	# random_alphabeta()
 	# alphabeta_alphabeta()
 	# alphabeta_fsss()
+	# tournament()
 	generic()
 	pass
 
 
 if __name__ == "__main__":
+	enable_logging("log.log", logging.DEBUG)
 	main()
@@ -1,6 +1,7 @@
 #  Copyright (c) 2019 Owen Siljander
 import logging
 from copy import copy
+from random import Random
 
 # config = "[%(levelname)s]:%(name)s - %(message)s"
 # logging.basicConfig(format=config, filename='log.log', level=logging.DEBUG, filemode="w")
@@ -13,22 +14,196 @@ PITS_PER_ROW = 6
 COUNT_PER_PIT = 4
 BD_SIZE = 12  # BD_SIZE//2 is the first pit for player 2
 MOVE_LIMIT = 300
+TOTAL_SEEDS = BD_SIZE * COUNT_PER_PIT
+# Weights of the heuristics in Mancala.reward
+REWARD_WEIGHTS = (0.198649, 0.190084, 0.370793, 1, 0.565937)
+W1, W2, W3, W4, W6 = REWARD_WEIGHTS
+# What happens when a position repeats, see Mancala.repetition
+REPEAT_NONE = 0  # Nothing, play goes on until MOVE_LIMIT
+REPEAT_END = 1  # The game ends as it stands, seeds left on the board count for neither player
+REPEAT_OWN = 2  # The game ends and each player takes the seeds left on their side
+
+# Zobrist keys, one per (pit, seed count) and (store, seed count). These are generated from a fixed seed so that
+# hashes are stable between processes and runs, which matters for anything that is written to disk.
+_zobrist_rng = Random(0x4D414E43)
+ZOBRIST_PIT = [[_zobrist_rng.getrandbits(64) for _ in range(TOTAL_SEEDS + 1)] for _ in range(BD_SIZE)]
+ZOBRIST_STORE = [[_zobrist_rng.getrandbits(64) for _ in range(TOTAL_SEEDS + 1)] for _ in range(2)]
+ZOBRIST_P2 = _zobrist_rng.getrandbits(64)  # Mixed in when it is player 2's turn
+del _zobrist_rng
+
+
+def zobrist(board, p1_store: int, p2_store: int) -> int:
+	"""
+	Computes the Zobrist hash of a board from scratch.
+	:param board: Sequence of pit counts.
+	:param p1_store: Player 1's store.
+	:param p2_store: Player 2's store.
+	:return: 64-bit hash
+	"""
+	h = ZOBRIST_STORE[0][p1_store] ^ ZOBRIST_STORE[1][p2_store]
+	for i in range(0, BD_SIZE):
+		h ^= ZOBRIST_PIT[i][board[i]]
+	return h
+
+
+def _build_sowing_tables() -> tuple:
+	"""
+	Precomputes the result of sowing every pit with every possible number of seeds.
+	Sowing starts in the pit after the chosen one and wraps around the whole board, including the emptied pit.
+	:return: (increments, captures). increments[pit][seeds] is a tuple of (pit, seeds added) pairs and
+	captures[pit][seeds] is the run of opponent pits walking back from the last pit sown, in the order they are checked.
+	"""
+	increments = []
+	captures = []
+	for pit in range(0, BD_SIZE):
+		# Opponent's row, relative to the owner of the pit
+		first = BD_SIZE // 2 if pit < BD_SIZE // 2 else 0
+		pit_incs = []
+		pit_caps = []
+		for seeds in range(0, TOTAL_SEEDS + 1):
+			laps, rest = divmod(seeds, BD_SIZE)
+			added = [laps] * BD_SIZE
+			for j in range(1, rest + 1):
+				added[(pit + j) % BD_SIZE] += 1
+			pit_incs.append(tuple((i, added[i]) for i in range(0, BD_SIZE) if added[i]))
+			run = []
+			i = (pit + seeds) % BD_SIZE
+			while seeds and first <= i < first + BD_SIZE // 2 and len(run) < min(seeds, BD_SIZE // 2):
+				run.append(i)
+				i -= 1
+			pit_caps.append(tuple(run))
+		increments.append(tuple(pit_incs))
+		captures.append(tuple(pit_caps))
+	return tuple(increments), tuple(captures)
+
+
+SOW_INCREMENTS, SOW_CAPTURES = _build_sowing_tables()
+# SOW_TOTALS[pit][seeds] is (bitmask of the pits sown into, seeds added to player 1's row, seeds added to player 2's row)
+SOW_TOTALS = tuple(tuple((sum(1 << i for i, _ in incs), sum(inc for i, inc in incs if i < BD_SIZE // 2),
+                          sum(inc for i, inc in incs if i >= BD_SIZE // 2)) for incs in pit_incs)
+                   for pit_incs in SOW_INCREMENTS)
+
+# Legal moves are kept as a bitmask over the whole board, bit i set if pit i can be played
+ROW_MASK = (1 << PITS_PER_ROW) - 1
+ALL_PITS = (1 << BD_SIZE) - 1
+ROW_BITS = (0, ROW_MASK, ROW_MASK << PITS_PER_ROW)  # Indexed by player
+# PLAYER_ACTIONS[player][row mask] is the tuple of pits set in that player's row mask
+PLAYER_ACTIONS = (None,) + tuple(
+	tuple(tuple(p * PITS_PER_ROW + i for i in range(0, PITS_PER_ROW) if row >> i & 1) for row in range(0, ROW_MASK + 1))
+	for p in range(0, 2))
+ROW_FILLED = tuple(bin(row).count("1") for row in range(0, ROW_MASK + 1))  # Number of pits set in a row mask
 
 
 class Mancala:
 	"""
 	Representation of a Mancala game board.
+
+	Positions reached since the last capture are kept with the player to move, as a count per position hash. A capture
+	can never be undone, so the positions before it can't come back and are dropped. Reaching one of them again is a
+	repetition, handled according to the repetition policy which defaults to REPEAT_END, the same score as endless
+	play gets in endgame.py. Set it on the class or on a single game, copies keep it.
 	"""
+	repetition = REPEAT_END
 
 	def __init__(self):
 		# Create board based on defines
-		self.board = [COUNT_PER_PIT] * (2 * PITS_PER_ROW)
-		self.actions = []
 		self.is_terminal = False
 		self.p1_store = 0
 		self.p2_store = 0
 		self.num_moves = 0
-		self.actions = [i for i in range(0, BD_SIZE)]
+		self.repeated = False  # Game ended by repeating a position
+		self.board = [COUNT_PER_PIT] * (2 * PITS_PER_ROW)
+		self.legal = ALL_PITS  # Bitmask of legal actions, bit i set if pit i can be played
+		self.seen[self.hash] = 1
+
+	@property
+	def actions(self) -> list:
+		"""List of legal actions for both players, generated from the legal move bitmask."""
+		return list(PLAYER_ACTIONS[1][self.legal & ROW_MASK] + PLAYER_ACTIONS[2][self.legal >> PITS_PER_ROW])
+
+	@actions.setter
+	def actions(self, actions) -> None:
+		self.legal = 0
+		for i in actions:
+			self.legal |= 1 << i
+
+	@property
+	def board(self) -> list:
+		"""List of pit counts, player 1's row followed by player 2's row."""
+		return self._board
+
+	@board.setter
+	def board(self, board: list) -> None:
+		# Assigning a whole board invalidates the incremental hash and starts a new history. Mutating the list in place
+		# does not, call rehash() afterwards if you do that.
+		self._board = board
+		self.seen = {}  # Position hash with player to move, to times reached since the last capture
+		self.rehash()
+
+	def rehash(self) -> None:
+		"""Recomputes the Zobrist hash and the seed counts from the current board and stores."""
+		board = self._board
+		self.hash = zobrist(board, self.p1_store, self.p2_store)
+		# Kept up to date by play() for reward()
+		self.filled = sum(1 << i for i in range(0, BD_SIZE) if board[i])  # Bitmask of the pits holding seeds
+		self.p1_seeds = sum(board[:BD_SIZE // 2])  # Seeds in player 1's row
+		self.p2_seeds = sum(board[BD_SIZE // 2:])
+
+	def position_hash(self, player: int) -> int:
+		"""
+		Hash of the position including the player to move, suitable as a transposition key.
+		:param player: Player whose turn it is.
+		:return: 64-bit hash
+		"""
+		return self.hash ^ ZOBRIST_P2 if player == 2 else self.hash
+
+	def pack(self) -> bytes:
+		"""
+		Compact, hashable snapshot of the board and stores. Move count and terminal state are not included.
+		:return: BD_SIZE + 2 bytes, pits followed by p1 and p2 stores
+		"""
+		return bytes(self._board) + bytes((self.p1_store, self.p2_store))
+
+	@staticmethod
+	def unpack(state: bytes, player: int = 1, num_moves: int = 0):
+		"""
+		Rebuilds a game from a state produced by pack().
+		:param state: Packed state.
+		:param player: Player to move, used to generate the legal actions.
+		:param num_moves: Number of moves played so far.
+		:return: Mancala, with a history holding only this position
+		"""
+		m = Mancala.__new__(Mancala)
+		m.is_terminal = False
+		m.repeated = False
+		m.p1_store = state[BD_SIZE]
+		m.p2_store = state[BD_SIZE + 1]
+		m.num_moves = num_moves
+		m.board = list(state[:BD_SIZE])
+		m.seen[m.position_hash(player)] = 1
+		m.update_actions(player)
+		return m
+
+	def copy(self):
+		"""
+		Copies the game without going through __init__, the hash is carried over rather than recomputed.
+		:return: Mancala
+		"""
+		m = Mancala.__new__(Mancala)
+		m._board = copy(self._board)
+		m.seen = self.seen.copy()
+		m.legal = self.legal
+		m.is_terminal = self.is_terminal
+		m.repeated = self.repeated
+		m.repetition = self.repetition
+		m.p1_store = self.p1_store
+		m.p2_store = self.p2_store
+		m.num_moves = self.num_moves
+		m.hash = self.hash
+		m.filled = self.filled
+		m.p1_seeds = self.p1_seeds
+		m.p2_seeds = self.p2_seeds
+		return m
 
 	def __repr__(self):
 		r = "P1 {0}, P2 {1}, ".format(self.p1_store, self.p2_store)
@@ -46,32 +221,30 @@ class Mancala:
 		:raises ValueError: Invalid player number.
 		"""
 		# LOG.debug("_remove_slam: Checking grand slam. Player {0}".format(player))
+		board = self._board
 		check_zero = False
-		slam = True
 		end_of_segment = 0
 		opponent = 2 // player
 		# Dynamic range, 0 to half size of board for p2, half size of board to end for p1
 		for i in range((opponent - 1) * BD_SIZE // 2, BD_SIZE // player):
 			# find contiguous segment of 1 or 2 with all other entries being zero
-			if (self.board[i] == 1 or self.board[i] == 2) and not check_zero:
+			if (board[i] == 1 or board[i] == 2) and not check_zero:
 				end_of_segment = i
-			elif self.board[i] == 0 and check_zero:
-				continue
-			elif self.board[i] == 0 and not check_zero:
+			elif board[i] == 0:
 				check_zero = True
 			else:
-				slam = False
-				break
-		if slam:
-			cpy = copy(self.get_actions(player))
-			# LOG.debug("_remove_slam: Slam found, checking moves")
-			for i in self.get_actions(player):
-				if i + self.board[i] == (player - 1) * BD_SIZE + end_of_segment:
-					self.actions.remove(i)
-			# Check if only moves are grand slams
-			if not self.get_actions(player):
-				# LOG.debug("_remove_slam: Grand slam is only possible move for player")
-				self.actions += cpy
+				return
+		# LOG.debug("_remove_slam: Slam found, checking moves")
+		target = (player - 1) * BD_SIZE + end_of_segment
+		slams = 0
+		for i in PLAYER_ACTIONS[player][self.legal >> (player - 1) * PITS_PER_ROW & ROW_MASK]:
+			if i + board[i] == target:
+				slams |= 1 << i
+		# Only remove the grand slams if there is some other move left for the player
+		if self.legal & ROW_BITS[player] & ~slams:
+			self.legal &= ~slams
+		# else:
+		# 	LOG.debug("_remove_slam: Grand slam is only possible move for player")
 
 	def _end_game(self) -> None:
 		"""Ends the game, adds all pieces in players row to their store"""
@@ -87,21 +260,19 @@ class Mancala:
 
 	def update_actions(self, player: int) -> None:
 		"""
-		Updates actions for all players based on current board and list of actions
+		Updates the legal move bitmask for all players based on the current board
 		:param player: Current player's turn
 		"""
 		# LOG.info("update_actions: Current actions are {0}, board {1}".format(self.actions, self.board))
-		p1_movable = False
-		p2_movable = False
-		# Check if players have a move
-		self.actions = []
+		board = self._board
+		legal = 0
 		for i in range(0, BD_SIZE):
-			if self.board[i] != 0:
-				self.actions.append(i)
-				if i < BD_SIZE // 2:
-					p1_movable = True
-				else:
-					p2_movable = True
+			if board[i] != 0:
+				legal |= 1 << i
+		# Check if players have a move
+		p1_movable = legal & ROW_BITS[1]
+		p2_movable = legal & ROW_BITS[2]
+		self.legal = legal
 		if (not p1_movable and not p2_movable) or (player == 1 and not p1_movable or player == 2 and not p2_movable):
 			# end condition
 			# LOG.debug("update_actions: No legal move found.")
@@ -110,40 +281,34 @@ class Mancala:
 		elif not p1_movable and p2_movable:
 			# p2 must give p1 a legal action
 			# LOG.debug("update_actions: Player 1 cannot move, player 2 feeds.")
-			for i in self.get_actions(2):
+			for i in range(BD_SIZE // 2, BD_SIZE):
 				# P2 Must be able to reach opponents board
-				if self.board[i] + i < 12:
-					try:
-						self.actions.remove(i)
-					except ValueError as e:
-						raise ValueError("Couldn't remove action, {0}".format(e))
-		# LOG.error("update_actions: Failed to remove action".format(i, e))
+				if board[i] + i < 12:
+					legal &= ~(1 << i)
 		elif not p2_movable and p1_movable:
 			# p1 must give p2 a legal action
 			# LOG.debug("update_actions: Player 2 cannot move, player 1 feeds.")
-			for i in self.get_actions(1):
-				if self.board[i] + i < 6:
-					try:
-						self.actions.remove(i)
-					except ValueError as e:
-						raise ValueError("Couldn't remove action, {0}".format(e))
-		# LOG.error("update_actions: Failed to remove action".format(i, e))
+			for i in range(0, BD_SIZE // 2):
+				if board[i] + i < 6:
+					legal &= ~(1 << i)
 		elif p1_movable and p2_movable:
 			# LOG.debug("update_actions: Both players can move, detecting grand slams.")
 			self._remove_slam(player)
+			legal = self.legal
 		# LOG.info("update_actions: Resulting actions are {0}".format(self.actions))
+		self.legal = legal
 		# forgot why i put this here
-		if not self.actions:
+		if not legal:
 			# LOG.debug("Player has no moves")
 			self._end_game()
 			return
 
-	def play(self, pit: int, player: int = 1) -> None:
+	def play(self, pit: int, player: int = 1) -> tuple:
 		"""
 		Plays a move based on selected pit and player.
 		:param pit: Chosen pit number to play.
 		:param player: Player number.
-		:return: None
+		:return: Undo record, pass to unplay() to take the move back. Can be ignored.
 		"""
 		if player != 1 and player != 2 or pit < 0 or pit >= BD_SIZE or (player == 1 and pit >= BD_SIZE // 2) or (
 				player == 2 and pit < BD_SIZE // 2):
@@ -151,72 +316,178 @@ class Mancala:
 		elif self.is_terminal:
 			raise ValueError("play: State is terminal, no more moves are allowed")
 		# LOG.info("play: Playing move {0} for player {1}, board {2}".format(pit, player, self.board))
-		# Remove action
-		try:
-			self.actions.remove(pit)
-		except ValueError as e:
-			# LOG.error("play: Invalid move chosen {0}. {1}".format(pit, e))
+		legal = self.legal
+		if not legal >> pit & 1:
+			# LOG.error("play: Invalid move chosen {0}.".format(pit))
 			raise ValueError("Couldn't remove action")
-		affected = []
+		board = self._board
+		h = self.hash
+		p1_store = self.p1_store
+		p2_store = self.p2_store
 		# Get pieces, clear pit
-		pieces = self.board[pit]
-		self.board[pit] = 0
+		pieces = board[pit]
+		board[pit] = 0
+		h ^= ZOBRIST_PIT[pit][pieces] ^ ZOBRIST_PIT[pit][0]
 		# Distribute
-		opponent = 2 // player
-		i = pit
-		while pieces > 0:
-			if i == BD_SIZE - 1:
-				i = 0
-			else:
-				i += 1
-			pieces -= 1
-			self.board[i] += 1
-			# If pit contains 2 or 3 pieces and is on opponents side
-			if (self.board[i] == 2 or self.board[i] == 3) and (
-					opponent - 1) * BD_SIZE // 2 <= i < opponent * BD_SIZE // 2:
-				affected.append(i)
-			else:
-				affected = []
-		# Check for captures
+		for i, inc in SOW_INCREMENTS[pit][pieces]:
+			h ^= ZOBRIST_PIT[i][board[i]]
+			board[i] += inc
+			h ^= ZOBRIST_PIT[i][board[i]]
+		sown, added1, added2 = SOW_TOTALS[pit][pieces]
+		filled = self.filled & ~(1 << pit) | sown
+		p1_seeds = self.p1_seeds + added1
+		p2_seeds = self.p2_seeds + added2
+		# Check for captures, walking back from the last pit sown while pits contain 2 or 3 pieces
 		count = 0
-		for i in affected:
-			count += self.board[i]
-			self.board[i] = 0
+		captured = ()
+		for i in SOW_CAPTURES[pit][pieces]:
+			c = board[i]
+			if c != 2 and c != 3:
+				break
+			captured += ((i, c),)
+			h ^= ZOBRIST_PIT[i][c] ^ ZOBRIST_PIT[i][0]
+			filled &= ~(1 << i)
+			count += c
+			board[i] = 0
 		if player == 1:
-			self.p1_store += count
+			p1_seeds -= pieces
+			p2_seeds -= count
+		else:
+			p2_seeds -= pieces
+			p1_seeds -= count
+		if count:
+			if player == 1:
+				h ^= ZOBRIST_STORE[0][p1_store] ^ ZOBRIST_STORE[0][p1_store + count]
+				self.p1_store += count
+			else:
+				h ^= ZOBRIST_STORE[1][p2_store] ^ ZOBRIST_STORE[1][p2_store + count]
+				self.p2_store += count
+		# History, a capture makes every earlier position unreachable
+		key = h ^ ZOBRIST_P2 if player == 1 else h
+		seen = self.seen
+		history = None  # History to put back on unplay, None if this position is simply removed from it
+		if count:
+			history = seen
+			self.seen = {key: 1}
+		elif key in seen and self.repetition != REPEAT_NONE:
+			history = seen
+			self.seen = {}
+			self.repeated = True
+			if self.repetition == REPEAT_OWN:
+				filled = p1_seeds = p2_seeds = 0
+				for i in range(0, BD_SIZE):
+					c = board[i]
+					if c:
+						captured += ((i, c),)
+						h ^= ZOBRIST_PIT[i][c] ^ ZOBRIST_PIT[i][0]
+						board[i] = 0
+						if i < BD_SIZE // 2:
+							h ^= ZOBRIST_STORE[0][self.p1_store] ^ ZOBRIST_STORE[0][self.p1_store + c]
+							self.p1_store += c
+						else:
+							h ^= ZOBRIST_STORE[1][self.p2_store] ^ ZOBRIST_STORE[1][self.p2_store + c]
+							self.p2_store += c
 		else:
-			self.p2_store += count
+			seen[key] = seen.get(key, 0) + 1
+		undo = (pit, pieces, p1_store, p2_store, legal, self.hash, history, self.filled, self.p1_seeds,
+		        self.p2_seeds) + captured
+		self.hash = h
+		self.filled = filled
+		self.p1_seeds = p1_seeds
+		self.p2_seeds = p2_seeds
 		self.num_moves += 1
-		if self.p1_store > BD_SIZE * COUNT_PER_PIT // 2 or self.p2_store > BD_SIZE * COUNT_PER_PIT // 2 or \
-				self.num_moves > MOVE_LIMIT:
+		if self.repeated or self.p1_store > BD_SIZE * COUNT_PER_PIT // 2 or \
+				self.p2_store > BD_SIZE * COUNT_PER_PIT // 2 or self.num_moves > MOVE_LIMIT:
 			# LOG.debug("Player has captured more than half the pieces")
+			self.legal = legal & ~(1 << pit)
 			self._end_game()
 		else:
 			self.update_actions(2 // player)
+		return undo
+
+	def unplay(self, undo: tuple) -> None:
+		"""
+		Takes back a move, restoring the board, stores, move count, actions and hash to what they were before play().
+		Moves must be taken back in the reverse order they were played.
+		:param undo: Record returned by play().
+		:return: None
+		"""
+		pit, pieces, self.p1_store, self.p2_store, self.legal, h, history, self.filled, self.p1_seeds, \
+			self.p2_seeds = undo[:10]
+		if history is None:
+			key = self.hash ^ ZOBRIST_P2 if pit < BD_SIZE // 2 else self.hash
+			count = self.seen[key] - 1
+			if count:
+				self.seen[key] = count
+			else:
+				del self.seen[key]
+		else:
+			self.seen = history
+		self.hash = h
+		board = self._board
+		# Put captured seeds back, then pick the sown seeds back up
+		for i, count in undo[10:]:
+			board[i] = count
+		for i, inc in SOW_INCREMENTS[pit][pieces]:
+			board[i] -= inc
+		board[pit] = pieces
+		self.num_moves -= 1
+		self.is_terminal = False
+		self.repeated = False
 
 	def plain_reward(self) -> int:
 		"""Reward function that indicates quality of terminal state."""
 		return self.p1_store - self.p2_store
 
 	def reward(self, player: int) -> float:
-		h1 = self.board[(player - 1) * BD_SIZE // 2]
-		h2 = sum(self.board[i] for i in range((player - 1) * BD_SIZE // 2, player * BD_SIZE // 2))
-		h3 = sum(self.board[i] != 0 for i in range((player - 1) * BD_SIZE // 2, player * BD_SIZE // 2))
-		h4 = 0
-		h6 = 0
-		if player == 1:
-			h4 = self.p1_store
-			h6 = self.p2_store
-		elif player == 2:
-			h4 = self.p2_store
-			h6 = self.p1_store
+		"""Weighted heuristics of the player, the row counts are kept up to date by play() so this is O(1)."""
+		# h1 seeds in the first pit, h2 seeds in the row, h3 pits holding seeds, h4 own store, h6 opponent's store.
 		# Heuristic 5: "1 If previous move was the rightmost, 0 otherwise" is being ignored
 		# It has weight 0.418841 if need in the future. These heuristics are taken from
 		# Design of artificial intelligence for mancala games
 		# https://www.politesi.polimi.it/handle/10589/134455
-		heuristics = [h1, h2, h3, h4, h6]
-		weights = [0.198649, 0.190084, 0.370793, 1, 0.565937]
-		return sum(x * y for x, y in zip(heuristics, weights))
+		# Summed in the same order as the original sum over the heuristics, so values are unchanged to the last bit.
+		if player == 1:
+			return self._board[0] * W1 + self.p1_seeds * W2 + ROW_FILLED[self.filled & ROW_MASK] * W3 + \
+			       self.p1_store * W4 + self.p2_store * W6
+		return self._board[BD_SIZE // 2] * W1 + self.p2_seeds * W2 + ROW_FILLED[self.filled >> PITS_PER_ROW] * W3 + \
+		       self.p2_store * W4 + self.p1_store * W6
+
+	def reward_after(self, pit: int, player: int = 1) -> float:
+		"""
+		reward() of the opponent once player has played pit, worked out from the sowing tables without playing the move.
+		The opponent's reward only depends on their own row and the stores, so the updates to the mover's row, the hash,
+		the history and the legal moves that play() makes can be skipped. Equal to play(), reward(2 // player) and
+		unplay() down to the last bit. The pit must be a legal move.
+		:param pit: Pit played
+		:param player: Player making the move
+		:return: Reward of the other player
+		"""
+		if self.repetition == REPEAT_OWN:
+			# Sweeping the board on a repetition changes the row, play it out
+			undo = self.play(pit, player)
+			value = self.reward(2 // player)
+			self.unplay(undo)
+			return value
+		first = PITS_PER_ROW if player == 1 else 0
+		row = self._board[first:first + PITS_PER_ROW]
+		pieces = self._board[pit]
+		for i, inc in SOW_INCREMENTS[pit][pieces]:
+			if first <= i < first + PITS_PER_ROW:
+				row[i - first] += inc
+		count = 0
+		for i in SOW_CAPTURES[pit][pieces]:
+			c = row[i - first]
+			if c != 2 and c != 3:
+				break
+			count += c
+			row[i - first] = 0
+		if player == 1:
+			own, other = self.p2_store, self.p1_store + count
+		else:
+			own, other = self.p1_store, self.p2_store + count
+		# Same operations in the same order as reward()
+		return row[0] * W1 + sum(row) * W2 + sum(c != 0 for c in row) * W3 + own * W4 + other * W6
 
 	def get_actions(self, player):
 		"""
@@ -224,4 +495,12 @@ class Mancala:
 		:param player: Integer that indicates player.
 		:return: List of valid actions.
 		"""
-		return [x for x in self.actions if (player - 1) * BD_SIZE // 2 <= x < player * BD_SIZE // 2]
+		return list(PLAYER_ACTIONS[player][self.legal >> (player - 1) * PITS_PER_ROW & ROW_MASK])
+
+	def legal_mask(self, player: int) -> int:
+		"""
+		Returns the legal actions of the player as a bitmask over their own row, bit 0 is the player's first pit.
+		:param player: Integer that indicates player.
+		:return: Bitmask of PITS_PER_ROW bits.
+		"""
+		return self.legal >> (player - 1) * PITS_PER_ROW & ROW_MASK
@@ -1,6 +1,4 @@
 #  Copyright (c) 2019 Owen Siljander
-from copy import copy
-
 from mancala import Mancala
 
 # import logging
@@ -20,7 +18,34 @@ POS_INF = 1000
 # node_log.setLevel(logging.DEBUG)
 
 
+# Fields only some algorithms use, created the first time they are read. The factories are given the node.
+LAZY_FIELDS = {
+	# UCT
+	"visits": lambda n: 0,  # Number of visits to node
+	"tot_reward": lambda n: 0,  # Reward of node
+	"children": lambda n: [],  # Children of the node
+	# FSSS-Minimax
+	"U": lambda n: POS_INF,  # Upper bound
+	"L": lambda n: NEG_INF,  # Lower bound
+	"Uprime": lambda n: {},
+	"Lprime": lambda n: {},
+	"childs": lambda n: {},  # This is a bandage for needing a map in FSSS-Minimax, child node mapped by action
+	# Testing purposes
+	"value": lambda n: 0,
+	"actions": lambda n: [],
+}
+# Fields play() starts over, the rest carry on to the new position
+RESET_FIELDS = ("children", "U", "L", "Uprime", "Lprime", "childs")
+
+
 class Node:
+	"""
+	Node class representing a specific game state within a search tree. Only the game, player, tree position and
+	untried actions are set up front, the fields of each algorithm in LAZY_FIELDS are made on first use. Each search only
+	pays for the fields it reads, UCT nodes never make the FSSS bounds and FSSS nodes never make the UCT statistics.
+	"""
+	__slots__ = ("leaf", "depth", "parent", "action", "player", "manc", "untried_actions") + tuple(LAZY_FIELDS)
+
 	def __init__(self, manc: Mancala, player: int = 1, depth: int = 0, parent=None, terminal: bool = False):
 		"""
 		Node class representing a specific game state within a search tree. Contains useful tree m_node attributes.
@@ -31,28 +56,23 @@ class Node:
 		:param terminal: Indicates if node is a leaf node or not.
 		"""
 		# node_log.debug("Node created, is_terminal: {0}".format(terminal))
-		self.leaf = terminal  # Is a leaf node (i.e. terminal game state)
+		self.leaf = terminal or manc.is_terminal  # Is a leaf node (i.e. terminal game state)
 		self.depth = depth  # Depth of node
-		self.visits = 0  # Number of visits to node, UCT
-		self.tot_reward = 0  # Reward of node, UCT
 		self.parent = parent  # Parent node
 		self.action = -1  # Action taken to get here from parent
 		self.player = player  # Current player's turn
-		if manc.is_terminal:
-			self.leaf = True
 		self.manc = manc  # Mancala board
-		self.untried_actions = self.manc.get_actions(player)  # Used in UCT to avoid UCB1 computations
-		self.children = []  # Children of the node
-		self.U = POS_INF  # Upper bound, FSSS-Minimax
-		self.L = NEG_INF  # Lower bound, FSSS-Minimax
-		self.Uprime = {}  # Used in FSSS-Minimax
-		self.Lprime = {}  # Used in FSSS-Minimax
-		# This is a bandage for needing a map in FSSS-Minimax, child node mapped by action
-		self.childs = {}
-
-		# Testing purposes
-		self.value = 0
-		self.actions = []
+		self.untried_actions = manc.get_actions(player)  # Used in UCT to avoid UCB1 computations
+
+	def __getattr__(self, name: str):
+		# Only called for fields that haven't been set, gives them their starting value
+		try:
+			factory = LAZY_FIELDS[name]
+		except KeyError:
+			raise AttributeError("'Node' object has no attribute '{0}'".format(name)) from None
+		value = factory(self)
+		setattr(self, name, value)
+		return value
 
 	@staticmethod
 	def copy_node(n):
@@ -61,14 +81,7 @@ class Node:
 		:param n: Node to be copied
 		:return: Copied node
 		"""
-		m = Node(Mancala(), n.player, n.depth, None, n.manc.is_terminal)
-		m.manc.board = copy(n.manc.board)
-		m.manc.actions = copy(n.manc.actions)
-		m.manc.is_terminal = n.manc.is_terminal
-		m.manc.p1_store = n.manc.p1_store
-		m.manc.p2_store = n.manc.p2_store
-		m.manc.num_moves = n.manc.num_moves
-		return m
+		return Node(n.manc.copy(), n.player, n.depth, None, n.manc.is_terminal)
 
 	def rollout(self, action: int):
 		"""
@@ -76,9 +89,10 @@ class Node:
 		:param action: Action to play
 		:return: Node with its game having played the action
 		"""
-		n = Node.copy_node(self)
-		n.play(action)
-		return n
+		# The move is played on the copied game before the node is made, rather than clearing a new node with play()
+		manc = self.manc.copy()
+		manc.play(action, self.player)
+		return Node(manc, 2 // self.player, self.depth)
 
 	def play(self, action: int) -> None:
 		"""
@@ -89,14 +103,13 @@ class Node:
 		self.manc.play(action, self.player)
 		self.player = 2 // self.player
 		self.untried_actions = self.get_actions()
-		# All information about the node as a part of a tree is clobbered
-		self.children = []
+		# All information about the node as a part of a tree is clobbered, it is made again on first use
 		self.parent = None
-		self.Uprime = {}
-		self.Lprime = {}
-		self.childs = {}
-		self.L = NEG_INF
-		self.U = POS_INF
+		for name in RESET_FIELDS:
+			try:
+				delattr(self, name)
+			except AttributeError:
+				pass
 		if self.manc.is_terminal:
 			self.leaf = True
 
@@ -112,6 +125,10 @@ class Node:
 		"""Get's the available actions for the current node"""
 		return self.manc.get_actions(self.player)
 
+	def key(self) -> int:
+		"""Hash of the game state and player to move, equal for transposed positions"""
+		return self.manc.position_hash(self.player)
+
 	# Below functions are used for testing FSSS-Minimax
 	def test_get_actions(self):
 		return self.actions
@@ -0,0 +1,219 @@
+#  Copyright (c) 2019 Owen Siljander
+import os
+import random
+from multiprocessing import Pool
+from random import Random
+
+from algs import uct_search, ucb1, tree_policy, back_propagate, virtual_loss, best_uct_child, \
+	default_policy, heuristic_policy, _play_book, NEG_INF
+from node import Node
+from stats import SearchStats
+
+
+# ******************************************************************************
+# * Root-parallel UCT
+# ******************************************************************************
+
+def _root_search(args: tuple) -> list:
+	"""
+	Worker side of RootParallelUCT, runs an independent UCT search from the root.
+	:param args: (game, player, constant, limit, policy, rollouts, seed)
+	:return: List of (action, visits, total reward) for the root's children, and the search's counts from
+	SearchStats.as_dict()
+	"""
+	manc, player, constant, limit, policy, rollouts, seed = args
+	random.seed(seed)
+	rng = None
+	if rollouts > 1:
+		import numpy as np
+		rng = np.random.default_rng(seed)
+	root = Node(manc, player)
+	stats = SearchStats()
+	uct_search(root, constant, limit, policy, rollouts, rng, stats)
+	return [(c.action, c.visits, c.tot_reward) for c in root.children], stats.as_dict()
+
+
+class _PoolAgent:
+	"""
+	Keeps a worker pool and a seed sequence alive between moves. Call close() (or use as a context manager) when done.
+	"""
+
+	def __init__(self, workers: int = None, seed: int = 0):
+		"""
+		:param workers: Number of worker processes, defaults to the number of CPUs
+		:param seed: Base seed, the same seed and sequence of positions gives the same moves
+		"""
+		self.workers = workers or os.cpu_count() or 1
+		self.pool = Pool(self.workers)
+		self.rng = Random(seed)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def close(self) -> None:
+		"""Shuts down the worker pool"""
+		self.pool.close()
+		self.pool.join()
+
+
+class RootParallelUCT(_PoolAgent):
+	"""
+	Root-parallel UCT. Each move, K independent searches are run from the same root in worker processes, each with its own
+	seed and a share of the iteration limit. Their root children's visits and rewards are summed before choosing a move.
+	"""
+
+	def __init__(self, workers: int = None, seed: int = 0, searches: int = None):
+		"""
+		:param workers: Number of worker processes, defaults to the number of CPUs
+		:param seed: Base seed, the same seed and sequence of positions gives the same moves
+		:param searches: Independent searches per move, defaults to the number of workers
+		"""
+		super().__init__(workers, seed)
+		self.searches = searches if searches is not None else self.workers
+
+	def search(self, m_node: Node, constant, limit, policy=0, rollouts: int = 1, stats: SearchStats = None) -> dict:
+		"""
+		Runs the searches and merges their results.
+		:param m_node: Node to search from, not modified
+		:param stats: Optional SearchStats to add the searches' counts to, timed as a single search
+		:return: Dictionary of action to (visits, total reward)
+		"""
+		if stats is None:
+			stats = SearchStats()
+		stats.start()
+		# Every search gets at least one expansion, so a limit below the number of searches runs fewer of them
+		searches = max(1, min(self.searches, limit))
+		share, extra = divmod(limit, searches)
+		jobs = []
+		for k in range(0, searches):
+			jobs.append((m_node.manc, m_node.player, constant, share + (k < extra), policy, rollouts,
+			             self.rng.getrandbits(63)))
+		merged = {}
+		for children, counts in self.pool.map(_root_search, jobs):
+			for action, visits, reward in children:
+				v, r = merged.get(action, (0, 0))
+				merged[action] = (v + visits, r + reward)
+			# The workers' time overlaps, so only this call's wall time is counted
+			counts["searches"] = 0
+			counts["elapsed"] = 0.0
+			stats.merge(counts)
+		stats.stop()
+		return merged
+
+	def __call__(self, m_node: Node, constant, limit, policy=0, rollouts: int = 1, stats: SearchStats = None) -> None:
+		"""
+		Plays a move for the node, same parameters as uct().
+		:param m_node: Node to choose action for
+		:param constant: Constant for UCB1
+		:param limit: Max number of expansions, shared between the searches
+		:param policy: Policy for reward
+		:param rollouts: Simulations per expansion
+		:param stats: Optional SearchStats to add this search's counts to
+		:return: None
+		"""
+		if _play_book(m_node):
+			return
+		merged = self.search(m_node, constant, limit, policy, rollouts, stats)
+		if not merged:
+			# Nothing was expanded, play the first legal move rather than an invalid one
+			m_node.play(m_node.get_actions()[0])
+			return
+		total = sum(v for v, _ in merged.values())
+		best = NEG_INF
+		best_action = -1
+		# Same order as the children of a single search so that ties break the same way
+		for action in sorted(merged):
+			visits, reward = merged[action]
+			res = ucb1(reward, visits, total, constant)
+			if res > best:
+				best = res
+				best_action = action
+		m_node.play(best_action)
+
+
+# ******************************************************************************
+# * Tree-parallel UCT
+# ******************************************************************************
+
+def _leaf_rollout(args: tuple) -> float:
+	"""
+	Worker side of TreeParallelUCT, simulates one game from a leaf.
+	:param args: (game, player, policy, seed)
+	:return: Reward of the simulation
+	"""
+	manc, player, policy, seed = args
+	random.seed(seed)
+	n = Node(manc, player)
+	if policy == 0:
+		return default_policy(n)
+	return heuristic_policy(n)
+
+
+class TreeParallelUCT(_PoolAgent):
+	"""
+	Tree-parallel UCT with virtual loss. A single tree is kept in this process. Each iteration selects several leaves,
+	adding a virtual loss along each path so that later selections in the same iteration go elsewhere. The leaves'
+	simulations run in the worker pool and their real results are back propagated once they return.
+	"""
+
+	def __init__(self, workers: int = None, seed: int = 0, leaves: int = None, loss: int = 1):
+		"""
+		:param workers: Number of worker processes, defaults to the number of CPUs
+		:param seed: Base seed, the same seed and sequence of positions gives the same moves
+		:param leaves: Leaves selected per iteration, defaults to the number of workers
+		:param loss: Virtual visits added along a selected path
+		"""
+		super().__init__(workers, seed)
+		self.leaves = leaves if leaves is not None else self.workers
+		self.loss = loss
+
+	def search(self, m_node: Node, constant, limit, policy=0, stats: SearchStats = None) -> None:
+		"""
+		Grows the UCT tree under m_node by limit simulations without playing a move.
+		:param stats: Optional SearchStats to add this search's counts to
+		"""
+		if stats is None:
+			stats = SearchStats()
+		stats.start()
+		done = 0
+		while done < limit:
+			selected = []
+			for _ in range(0, min(self.leaves, limit - done)):
+				n1 = tree_policy(m_node, constant)
+				if n1.visits == 0 and n1 is not m_node:
+					# Just expanded
+					stats.nodes += 1
+				depth = 0
+				n = n1
+				while n is not m_node:
+					depth += 1
+					n = n.parent
+				if depth > stats.max_depth:
+					stats.max_depth = depth
+				virtual_loss(n1, self.loss)
+				selected.append(n1)
+			jobs = [(n1.manc, n1.player, policy, self.rng.getrandbits(63)) for n1 in selected]
+			for n1, delta in zip(selected, self.pool.map(_leaf_rollout, jobs)):
+				virtual_loss(n1, -self.loss)
+				back_propagate(n1, delta)
+			done += len(selected)
+			stats.leaves += len(selected)
+		stats.stop()
+
+	def __call__(self, m_node: Node, constant, limit, policy=0, stats: SearchStats = None) -> None:
+		"""
+		Plays a move for the node, same parameters as uct().
+		:param m_node: Node to choose action for
+		:param constant: Constant for UCB1
+		:param limit: Max number of simulations
+		:param policy: Policy for reward
+		:param stats: Optional SearchStats to add this search's counts to
+		:return: None
+		"""
+		if _play_book(m_node):
+			return
+		self.search(m_node, constant, limit, policy, stats)
+		m_node.play(best_uct_child(m_node, constant).action)
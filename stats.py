@@ -0,0 +1,180 @@
+#  Copyright (c) 2019 Owen Siljander
+import time
+from math import ceil, log2
+
+# Game phases by seeds left on the board, out of 48
+PHASES = ("opening", "middlegame", "endgame")
+OPENING_SEEDS = 36  # More than this on the board is the opening
+ENDGAME_SEEDS = 16  # This many or fewer is the endgame
+
+
+def game_phase(seeds: int) -> str:
+	"""
+	:param seeds: Seeds on the board
+	:return: Phase of the game
+	"""
+	if seeds > OPENING_SEEDS:
+		return "opening"
+	if seeds > ENDGAME_SEEDS:
+		return "middlegame"
+	return "endgame"
+
+
+class SearchStats:
+	"""
+	Counters for one or more searches, filled in by the agents in algs.py when passed as their stats argument. A single
+	object can be passed to every move of a game to total them, objects from different processes can be combined with
+	merge().
+	"""
+
+	def __init__(self):
+		self.searches = 0  # Agent calls counted
+		self.nodes = 0  # Nodes expanded, UCT counts new tree nodes
+		self.leaves = 0  # Leaf evaluations, UCT counts simulations
+		self.cutoffs = 0  # Alpha-beta cutoffs
+		self.max_depth = 0  # Deepest ply reached below the root
+		self.elapsed = 0.0  # Wall time in seconds
+		self.tt_hits = 0  # Transposition table probes that found the position
+		self.tt_probes = 0
+		self._start = None
+
+	def __repr__(self):
+		r = "{0} searches, {1} nodes, {2} leaves, {3} cutoffs, max depth {4}, {5:.3f}s, {6:.0f} nodes/s".format(
+			self.searches, self.nodes, self.leaves, self.cutoffs, self.max_depth, self.elapsed, self.nodes_per_sec())
+		if self.tt_probes:
+			r += ", TT hit rate {0:.3f}".format(self.tt_hit_rate())
+		return r
+
+	def start(self, table=None) -> None:
+		"""
+		Starts timing a search.
+		:param table: Transposition table the search uses, if any
+		"""
+		if table is None:
+			self._start = (time.perf_counter(), None, 0, 0)
+		else:
+			self._start = (time.perf_counter(), table, table.hits, table.hits + table.misses)
+
+	def stop(self) -> None:
+		"""Stops timing the search started with start()"""
+		start, table, hits, probes = self._start
+		self.elapsed += time.perf_counter() - start
+		if table is not None:
+			self.tt_hits += table.hits - hits
+			self.tt_probes += table.hits + table.misses - probes
+		self.searches += 1
+		self._start = None
+
+	def nodes_per_sec(self) -> float:
+		return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+	def tt_hit_rate(self) -> float:
+		return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+
+	def merge(self, other) -> None:
+		"""
+		Adds the counts of another SearchStats, or of a dictionary from as_dict().
+		:param other: Statistics to add
+		"""
+		if isinstance(other, SearchStats):
+			other = other.as_dict()
+		self.searches += other["searches"]
+		self.nodes += other["nodes"]
+		self.leaves += other["leaves"]
+		self.cutoffs += other["cutoffs"]
+		self.max_depth = max(self.max_depth, other["max_depth"])
+		self.elapsed += other["elapsed"]
+		self.tt_hits += other["tt_hits"]
+		self.tt_probes += other["tt_probes"]
+
+	def as_dict(self) -> dict:
+		"""Counters as a dictionary that can be written as JSON"""
+		return {
+			"searches": self.searches,
+			"nodes": self.nodes,
+			"leaves": self.leaves,
+			"cutoffs": self.cutoffs,
+			"max_depth": self.max_depth,
+			"elapsed": self.elapsed,
+			"tt_hits": self.tt_hits,
+			"tt_probes": self.tt_probes,
+		}
+
+
+class LatencyHistogram:
+	"""
+	Histogram of latencies in nanoseconds with logarithmic buckets, BUCKETS_PER_DOUBLING to each power of two, so
+	percentiles are within about 9% whatever the scale. Buckets are kept sparse and histograms merge by adding counts,
+	including ones sent between processes with as_dict().
+	"""
+	BUCKETS_PER_DOUBLING = 8
+
+	def __init__(self):
+		self.buckets = {}  # Bucket index to count
+		self.count = 0
+		self.total = 0
+		self.max = 0
+
+	def __repr__(self):
+		if not self.count:
+			return "no moves"
+		return "{0} moves, p50 {1:.3f}ms, p90 {2:.3f}ms, p99 {3:.3f}ms, max {4:.3f}ms".format(
+			self.count, self.percentile(50) / 1e6, self.percentile(90) / 1e6, self.percentile(99) / 1e6, self.max / 1e6)
+
+	def record(self, ns: int) -> None:
+		"""
+		Adds a latency.
+		:param ns: Latency in nanoseconds, e.g. a difference of time.perf_counter_ns()
+		"""
+		b = int(log2(ns) * self.BUCKETS_PER_DOUBLING) if ns > 1 else 0
+		self.buckets[b] = self.buckets.get(b, 0) + 1
+		self.count += 1
+		self.total += ns
+		if ns > self.max:
+			self.max = ns
+
+	def percentile(self, p: float) -> float:
+		"""
+		:param p: Percentile, 0 to 100
+		:return: Upper bound of the bucket holding the percentile, in nanoseconds. 0 if nothing was recorded.
+		"""
+		if not self.count:
+			return 0
+		target = max(1, ceil(p / 100 * self.count))
+		seen = 0
+		for b in sorted(self.buckets):
+			seen += self.buckets[b]
+			if seen >= target:
+				return min(2 ** ((b + 1) / self.BUCKETS_PER_DOUBLING), self.max)
+		return self.max
+
+	def mean(self) -> float:
+		return self.total / self.count if self.count else 0
+
+	def merge(self, other) -> None:
+		"""
+		Adds the counts of another LatencyHistogram, or of a dictionary from as_dict().
+		:param other: Histogram to add
+		"""
+		if not isinstance(other, LatencyHistogram):
+			other = LatencyHistogram.from_dict(other)
+		for b, c in other.buckets.items():
+			self.buckets[b] = self.buckets.get(b, 0) + c
+		self.count += other.count
+		self.total += other.total
+		self.max = max(self.max, other.max)
+
+	def as_dict(self) -> dict:
+		"""Histogram as a dictionary that can be written as JSON"""
+		return {"buckets": {str(b): c for b, c in self.buckets.items()}, "count": self.count, "total": self.total,
+		        "max": self.max}
+
+	@staticmethod
+	def from_dict(d: dict):
+		"""Inverse of as_dict()"""
+		h = LatencyHistogram()
+		h.buckets = {int(b): c for b, c in d["buckets"].items()}
+		h.count = d["count"]
+		h.total = d["total"]
+		h.max = d["max"]
+		return h
@@ -1,10 +1,14 @@
 #  Copyright (c) 2019 Owen Siljander
 
+import time
+from random import Random
 from unittest import TestCase
 
-from algs import alphabeta
-from mancala import Mancala
+from algs import alphabeta, iterative_alphabeta, _DeepeningSearch
+from mancala import Mancala, REPEAT_NONE
 from node import Node
+from stats import SearchStats
+from transposition import TranspositionTable
 
 NEG_INF = -1000
 POS_INF = 1000
@@ -19,3 +23,70 @@ class TestAlphabeta(TestCase):
 		self.assertIn(self.n.manc.board, [[0, 5, 5, 5, 5, 4, 4, 4, 4, 4, 4, 4], [4, 0, 5, 5, 5, 5, 4, 4, 4, 4, 4, 4],
 		                                  [4, 4, 0, 5, 5, 5, 5, 4, 4, 4, 4, 4], [4, 4, 4, 0, 5, 5, 5, 5, 4, 4, 4, 4],
 		                                  [4, 4, 4, 4, 0, 5, 5, 5, 5, 4, 4, 4], [4, 4, 4, 4, 4, 0, 5, 5, 5, 5, 4, 4]])
+
+	def test_frontier(self):
+		# Same values as a plain minimax that plays every leaf
+		def minimax(manc, player, depth):
+			if manc.is_terminal or depth == 0:
+				return manc.reward(player)
+			values = []
+			for action in manc.get_actions(player):
+				undo = manc.play(action, player)
+				values.append(minimax(manc, 2 // player, depth - 1))
+				manc.unplay(undo)
+			return max(values) if player == 1 else min(values)
+
+		rng = Random(4)
+		while not self.n.leaf:
+			for depth in range(1, 4):
+				value = minimax(self.n.manc, self.n.player, depth)
+				self.assertEqual(value, alphabeta(self.n, NEG_INF, POS_INF, depth, False))
+			n = Node.copy_node(self.n)
+			alphabeta(n, NEG_INF, POS_INF, 3, True)
+			self.assertEqual(minimax(self.n.manc, self.n.player, 3), minimax(n.manc, n.player, 2))
+			self.n.play(rng.choice(self.n.get_actions()))
+
+	def test_repetition(self):
+		# Seeds going round an empty board, repeating positions both sides can play into
+		manc = Mancala.unpack(bytes([0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 1, 23, 23]), 1)
+		seen = dict(manc.seen)
+		stats = SearchStats()
+		alphabeta(Node(manc, 1), NEG_INF, POS_INF, 30, False, stats=stats)
+		# Search takes its moves back, history included, and stops at repetitions well within the depth
+		self.assertEqual(seen, manc.seen)
+		self.assertLess(stats.max_depth, 30)
+		manc.repetition = REPEAT_NONE
+		looping = SearchStats()
+		alphabeta(Node(manc, 1), NEG_INF, POS_INF, 30, False, stats=looping)
+		self.assertEqual(30, looping.max_depth)
+
+	def test_iterative_alphabeta(self):
+		# Move ordering must not change the value of the search
+		rng = Random(2)
+		for _ in range(15):
+			for depth in range(1, 6):
+				ctx = _DeepeningSearch(TranspositionTable(1 << 12), None, None)
+				value, action = ctx.search(self.n.manc, self.n.player, NEG_INF, POS_INF, depth, 0)
+				self.assertEqual(alphabeta(self.n, NEG_INF, POS_INF, depth, False), value)
+				self.assertIn(action, self.n.get_actions())
+			self.n.play(rng.choice(self.n.get_actions()))
+		# Depth limit and time budget
+		self.assertEqual(4, iterative_alphabeta(self.n, max_depth=4))
+		self.assertEqual(1, self.n.player)
+		start = time.perf_counter()
+		self.assertGreaterEqual(iterative_alphabeta(self.n, max_time=0.05), 1)
+		self.assertLess(time.perf_counter() - start, 1)
+		self.assertGreaterEqual(iterative_alphabeta(self.n, max_nodes=200), 1)
+
+	def test_reused_table(self):
+		# Entries left by earlier moves don't stop deepening unless they hold searches that reached the end of the game
+		table = TranspositionTable(1 << 16)
+		rng = Random(0)
+		for _ in range(8):
+			self.assertEqual(7, iterative_alphabeta(Node.copy_node(self.n), max_depth=7, table=table))
+			self.n.play(rng.choice(self.n.get_actions()))
+		manc = Mancala.unpack(bytes([0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 1, 23, 23]), 1)
+		solved = iterative_alphabeta(Node(manc.copy(), 1), max_depth=40, table=table)
+		self.assertLess(solved, 40)
+		# Solved entries hold at any depth, so the same search again can stop sooner
+		self.assertLessEqual(iterative_alphabeta(Node(manc.copy(), 1), max_depth=40, table=table), solved)
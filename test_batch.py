@@ -0,0 +1,168 @@
+#  Copyright (c) 2019 Owen Siljander
+
+from random import Random
+from unittest import TestCase, skipUnless
+
+from mancala import Mancala, REPEAT_NONE, REPEAT_END, REPEAT_OWN
+
+try:
+	import numpy as np
+	import batch
+	from batch import MancalaBatch
+except ImportError:
+	np = None
+
+
+@skipUnless(np, "NumPy not installed")
+class TestBatch(TestCase):
+	def games(self, count: int, seed: int) -> list:
+		"""Plays random games with the scalar rules, returning (board, stores, num_moves, player, pit) for every move"""
+		rng = Random(seed)
+		moves = []
+		for _ in range(count):
+			m = Mancala()
+			player = 1
+			while not m.is_terminal:
+				pit = rng.choice(m.get_actions(player))
+				moves.append((list(m.board), [m.p1_store, m.p2_store], m.num_moves, player, pit))
+				m.play(pit, player)
+				player = 2 // player
+		return moves
+
+	def test_play(self):
+		moves = self.games(40, 3)
+		board = np.array([x[0] for x in moves], dtype=np.int16)
+		stores = np.array([x[1] for x in moves], dtype=np.int16)
+		num_moves = np.array([x[2] for x in moves], dtype=np.int16)
+		players = np.array([x[3] for x in moves], dtype=np.int16)
+		pits = np.array([x[4] for x in moves])
+		legal, terminal = batch.play(board, stores, num_moves, pits, players)
+		for i, (b, s, n, player, pit) in enumerate(moves):
+			m = Mancala()
+			m.p1_store, m.p2_store = s
+			m.board = b
+			m.num_moves = n
+			m.update_actions(player)
+			m.play(pit, player)
+			self.assertEqual(m.board, board[i].tolist())
+			self.assertEqual([m.p1_store, m.p2_store], stores[i].tolist())
+			self.assertEqual(m.is_terminal, terminal[i])
+			if not m.is_terminal:
+				self.assertEqual(m.actions, np.nonzero(legal[i])[0].tolist())
+			self.assertAlmostEqual(m.reward(2 // player), batch.reward(board[i:i + 1], stores[i:i + 1],
+			                                                           players[i:i + 1] % 2 + 1)[0])
+
+	def test_rollout(self):
+		m = Mancala()
+		outcomes = batch.rollout(m, 1, 200, 0, np.random.default_rng(1))
+		self.assertEqual((200,), outcomes.shape)
+		self.assertTrue(np.isin(outcomes, [0, 0.5, 1]).all())
+		self.assertEqual(Mancala().board, m.board)
+		# Terminal positions are scored without playing
+		m.is_terminal = True
+		m.p1_store = 30
+		self.assertTrue((batch.rollout(m, 1, 5) == 1).all())
+
+	def test_rollout_repetition(self):
+		# Player 1's only move leads back to a position already in the history, so every game ends on it
+		m = Mancala.unpack(bytes([0, 0, 0, 0, 1, 0, 3, 0, 2, 0, 0, 5] + [20, 17]), 1)
+		self.assertEqual([4], m.get_actions(1))
+		for repetition in (REPEAT_END, REPEAT_OWN):
+			m.repetition = repetition
+			after = m.copy()
+			after.play(4, 1)
+			m.seen[after.position_hash(2)] = 1
+			after = m.copy()
+			after.play(4, 1)
+			self.assertTrue(after.repeated)
+			self.assertEqual([after.reward(2)] * 8, batch.rollout(m, 1, 8, 1).tolist())
+		m.repetition = REPEAT_NONE
+		self.assertEqual((8,), batch.rollout(m, 1, 8, 1, np.random.default_rng(0)).shape)
+
+
+@skipUnless(np, "NumPy not installed")
+class TestMancalaBatch(TestCase):
+	def assertMatches(self, b, games: list, players: list):
+		"""Differential check of every game in a batch against the scalar game it should equal"""
+		self.assertEqual(len(games), len(b))
+		for i, (m, player) in enumerate(zip(games, players)):
+			self.assertEqual(m.board, b.board[i].tolist())
+			self.assertEqual([m.p1_store, m.p2_store], b.stores[i].tolist())
+			self.assertEqual(m.num_moves, b.num_moves[i])
+			self.assertEqual(player, b.player[i])
+			self.assertEqual(m.is_terminal, b.terminal[i])
+			if not m.is_terminal:
+				self.assertEqual(m.legal_mask(player), b.legal_mask()[i])
+			# Exactly equal, not just close
+			self.assertEqual(m.reward(player), b.reward()[i])
+			self.assertEqual(m.reward(2 // player), b.reward(2 // player)[i])
+
+	def test_differential(self):
+		# Random games played move by move in both, dropping those that finish, under every repetition policy
+		for repetition in (REPEAT_NONE, REPEAT_END, REPEAT_OWN):
+			rng = Random(5)
+			games = [Mancala() for _ in range(48)]
+			for m in games:
+				m.repetition = repetition
+			players = [1] * len(games)
+			b = MancalaBatch.from_games(games, players)
+			repeated = 0
+			while len(games):
+				self.assertMatches(b, games, players)
+				pits = [rng.choice(m.get_actions(p)) for m, p in zip(games, players)]
+				for m, p, pit in zip(games, players, pits):
+					m.play(pit, p)
+				players = [2 // p for p in players]
+				b.play(np.array(pits))
+				self.assertMatches(b, games, players)
+				repeated += sum(m.repeated for m in games)
+				live = [i for i, m in enumerate(games) if not m.is_terminal]
+				games = [games[i] for i in live]
+				players = [players[i] for i in live]
+				b = b.select(np.array(live, dtype=np.int64))
+			if repetition == REPEAT_NONE:
+				self.assertEqual(0, repeated)
+			else:
+				self.assertGreater(repeated, 0)
+
+	def test_history(self):
+		# Histories go back and forth between games and batches
+		m = Mancala()
+		m.play(2, 1)
+		m.play(8, 2)
+		b = MancalaBatch.from_games([m], [1])
+		self.assertEqual(m.seen, b.game(0).seen)
+		self.assertEqual(m.repetition, b.game(0).repetition)
+		b.play(0)
+		m.play(0, 1)
+		self.assertEqual(m.seen, b.game(0).seen)
+		with self.assertRaises(ValueError):
+			g = Mancala()
+			g.repetition = REPEAT_NONE
+			MancalaBatch.from_games([Mancala(), g], [1, 1])
+
+	def test_feeding_and_slams(self):
+		# Positions where feeding and grand slam rules decide the legal moves, built from pit counts alone
+		boards = [[1, 0, 2, 0, 0, 6, 2, 1, 2, 2, 1, 2], [1, 6, 6, 6, 5, 4, 0, 0, 0, 0, 0, 0],
+		          [0, 0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 5], [0, 0, 0, 0, 0, 0, 1, 2, 0, 0, 0, 0]]
+		for player in (1, 2):
+			games = [Mancala.unpack(bytes(board + [10, 10]), player) for board in boards]
+			b = MancalaBatch(boards, [[10, 10]] * len(boards), [player] * len(boards))
+			self.assertMatches(b, games, [player] * len(games))
+
+	def test_children(self):
+		m = Mancala()
+		m.play(2, 1)
+		b = MancalaBatch.from_games([Mancala(), m], [1, 2])
+		children, parent, pit = b.children()
+		self.assertEqual([0] * 6 + [1] * 6, parent.tolist())
+		self.assertEqual(list(range(0, 12)), pit.tolist())
+		for i in range(0, len(children)):
+			g = (Mancala() if parent[i] == 0 else m).copy()
+			g.play(int(pit[i]), int(b.player[parent[i]]))
+			self.assertEqual(g.board, children.game(i).board)
+			self.assertEqual(g.reward(1), children.reward(1)[i])
+		# Illegal moves are refused like Mancala.play
+		with self.assertRaises(ValueError):
+			b.play(0)
+		self.assertEqual(Mancala().board, b.board[0].tolist())
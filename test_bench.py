@@ -0,0 +1,38 @@
+#  Copyright (c) 2019 Owen Siljander
+
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+import bench
+
+
+class TestBench(TestCase):
+	def test_positions(self):
+		self.assertEqual(bench.positions(5), bench.positions(5))
+		for m, player in bench.games(bench.positions(5)):
+			self.assertFalse(m.is_terminal)
+			self.assertTrue(m.get_actions(player))
+
+	def test_compare(self):
+		baseline = {"a": 100, "b": 100, "c": 100}
+		self.assertEqual([("b", 80, 100)], bench.compare({"a": 95, "b": 80, "d": 1}, baseline, 0.1))
+		self.assertEqual([], bench.compare({"a": 95, "b": 80}, baseline, 0.25))
+
+	def test_main(self):
+		with tempfile.TemporaryDirectory() as d:
+			path = os.path.join(d, "bench.json")
+			self.assertEqual(0, bench.main(["--quick", "--json", path]))
+			with open(path) as f:
+				saved = json.load(f)
+			results = saved["results"]
+			self.assertIn("micro.play_unplay", results)
+			self.assertIn("search.alphabeta_d2", results)
+			self.assertIn("e2e.random()_v_random()", results)
+			self.assertTrue(all(rate > 0 for rate in results.values()))
+			# Against an impossibly fast baseline everything regresses
+			saved["results"] = {name: rate * 1000 for name, rate in results.items()}
+			with open(path, "w") as f:
+				json.dump(saved, f)
+			self.assertEqual(1, bench.main(["--quick", "--layers", "micro", "--baseline", path]))
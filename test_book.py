@@ -0,0 +1,66 @@
+#  Copyright (c) 2019 Owen Siljander
+
+import os
+import tempfile
+from unittest import TestCase
+
+import algs
+import book
+from mancala import Mancala
+from node import Node
+
+
+class TestBook(TestCase):
+	def setUp(self):
+		self.dir = tempfile.TemporaryDirectory()
+		self.path = os.path.join(self.dir.name, "book.bin")
+
+	def tearDown(self):
+		algs.set_book(None)
+		self.dir.cleanup()
+
+	def test_generate(self):
+		self.assertEqual(1 + 6, book.generate(self.path, 2, 3, 2))
+		b = book.OpeningBook(self.path)
+		self.assertEqual(7, len(b))
+		# Same move as a search of the same depth
+		n = Node(Mancala())
+		algs.iterative_alphabeta(n, max_depth=3)
+		m = Mancala()
+		m.play(b.probe(Mancala(), 1), 1)
+		self.assertEqual(n.manc.board, m.board)
+		self.assertIsNone(b.probe(n.manc, 2 // n.player))
+		b.close()
+
+	def test_incremental(self):
+		book.generate(self.path, 2, 2, 2)
+		# Only the new, longer lines and nothing already searched this deep
+		searched = book.generate(self.path, 3, 2, 2)
+		self.assertEqual(len(book.positions(3)) - 7, searched)
+		self.assertEqual(0, book.generate(self.path, 3, 2, 2))
+		# Deeper searches replace shallower ones
+		self.assertEqual(len(book.positions(3)), book.generate(self.path, 3, 3, 2))
+		b = book.OpeningBook(self.path)
+		self.assertTrue(all(depth == 3 for _, _, depth in b.entries().values()))
+		b.close()
+
+	def test_search_depth(self):
+		# MAX_DEPTH only for positions whose whole game tree was searched
+		self.assertEqual(3, book._book_search((Mancala(), 1, 3))[3])
+		manc = Mancala.unpack(bytes([0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 1, 23, 23]), 1)
+		self.assertEqual(book.MAX_DEPTH, book._book_search((manc, 1, 30))[3])
+
+	def test_agents(self):
+		book.generate(self.path, 1, 1, 1)
+		b = book.OpeningBook(self.path)
+		algs.set_book(b)
+		move = b.probe(Mancala(), 1)
+		for agent in (lambda n: algs.alphabeta(n, -1000, 1000, 3, True), lambda n: algs.uct(n, 1, 5),
+		              lambda n: algs.fsss(n, 2), lambda n: algs.iterative_alphabeta(n, max_depth=3)):
+			n = Node(Mancala())
+			agent(n)
+			m = Mancala()
+			m.play(move, 1)
+			self.assertEqual(m.board, n.manc.board)
+		self.assertEqual(5, b.hits)
+		b.close()
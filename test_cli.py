@@ -0,0 +1,64 @@
+#  Copyright (c) 2019 Owen Siljander
+
+import contextlib
+import io
+import logging
+import os
+import tempfile
+from unittest import TestCase
+
+import cli
+from logs import enable_logging
+
+
+class TestCli(TestCase):
+	def test_parse_agent(self):
+		self.assertEqual({"alg": "random"}, cli.parse_agent("random"))
+		self.assertEqual({"alg": "uct", "limit": 50, "constant": 0.5}, cli.parse_agent("uct:limit=50,constant=0.5"))
+		self.assertEqual({"alg": "fsss", "depth": 2}, cli.parse_agent('{"alg": "fsss", "depth": 2}'))
+
+	def test_analyze(self):
+		out = io.StringIO()
+		with contextlib.redirect_stdout(out):
+			self.assertEqual(0, cli.main(["analyze", "alphabeta:depth=2", "--board", "0,5,5,5,5,4,4,4,4,4,4,4",
+			                              "--player", "2"]))
+		self.assertIn("Player 2 plays pit", out.getvalue())
+		with contextlib.redirect_stderr(io.StringIO()):
+			self.assertEqual(2, cli.main(["analyze", "random", "--board", "1,2,3"]))
+
+	def test_match(self):
+		with tempfile.TemporaryDirectory() as d:
+			path = os.path.join(d, "results.jsonl")
+			args = ["match", "random", "alphabeta:depth=1", "--workers", "2", "--out", path, "--games"]
+			with contextlib.redirect_stdout(io.StringIO()):
+				self.assertEqual(0, cli.main(args + ["2"]))
+			# A longer match carries on from the file and reports the earlier games with the new ones
+			out = io.StringIO()
+			with contextlib.redirect_stdout(out):
+				self.assertEqual(0, cli.main(args + ["3"]))
+			self.assertIn("Resuming with 2 games already played", out.getvalue())
+			self.assertIn("Game 2:", out.getvalue())
+			self.assertNotIn("Game 1:", out.getvalue())
+			# Colours alternate, games 0 and 2 against game 1
+			self.assertIn("completed with 2 games played", out.getvalue())
+			self.assertIn("completed with 1 games played", out.getvalue())
+
+	def test_enable_logging(self):
+		root = logging.getLogger()
+		handlers = list(root.handlers)
+		level = root.level
+		try:
+			with tempfile.TemporaryDirectory() as d:
+				path = enable_logging(os.path.join(d, "log.{pid}.log"))
+				self.assertEqual(os.path.join(d, "log.{0}.log".format(os.getpid())), path)
+				logging.getLogger("alphabeta").info("hello")
+				self.assertEqual(1, len(root.handlers))
+				root.handlers[0].close()
+				with open(path) as f:
+					self.assertIn("INFO]:alphabeta - hello", f.read())
+		finally:
+			for handler in list(root.handlers):
+				root.removeHandler(handler)
+			for handler in handlers:
+				root.addHandler(handler)
+			root.setLevel(level)
@@ -0,0 +1,98 @@
+#  Copyright (c) 2019 Owen Siljander
+
+import os
+import tempfile
+from unittest import TestCase
+
+import algs
+import endgame
+from mancala import Mancala
+from node import Node, NEG_INF, POS_INF
+
+MAX_SEEDS = 4
+
+
+class TestEndgame(TestCase):
+	@classmethod
+	def setUpClass(cls):
+		cls.dir = tempfile.TemporaryDirectory()
+		cls.path = os.path.join(cls.dir.name, "endgame.db")
+		endgame.build(cls.path, MAX_SEEDS, 1)
+		cls.db = endgame.EndgameDB(cls.path)
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.db.close()
+		cls.dir.cleanup()
+
+	def tearDown(self):
+		algs.set_endgame(None)
+
+	def game(self, board: list, p1_store: int, player: int) -> Mancala:
+		return Mancala.unpack(bytes(board) + bytes((p1_store, endgame.TOTAL_SEEDS - sum(board) - p1_store)), player)
+
+	def test_rank(self):
+		for n in range(0, MAX_SEEDS + 1):
+			for r in range(0, endgame.level_size(n)):
+				board = endgame.unrank(r, n)
+				self.assertEqual(n, sum(board))
+				self.assertEqual(r, endgame.rank(board))
+
+	def test_value(self):
+		# Player 1 captures the last two seeds, grand slam allowed as it's the only move
+		m = self.game([0, 0, 0, 0, 0, 1, 1, 0, 0, 0, 0, 0], 22, 1)
+		self.assertEqual(2, self.db.value(m, 1))
+		self.assertEqual(0, self.db.final_score(m, 1))
+		# The capture takes player 1 past 24 seeds, ending the game with the rest left on the board
+		m = self.game([0, 0, 0, 0, 2, 1, 1, 0, 0, 0, 0, 0], 23, 1)
+		self.assertEqual(2, self.db.value(m, 1))
+		# Not covered
+		self.assertIsNone(self.db.value(Mancala(), 1))
+
+	def test_optimal(self):
+		# Every value is the best of its moves, the capture plus the value of the position reached
+		for n in range(0, MAX_SEEDS + 1):
+			for i in range(0, endgame.level_positions(n)):
+				which, r = divmod(i, endgame.level_size(n))
+				headroom, player = divmod(which, 2)
+				player += 1
+				m = self.game(endgame.unrank(r, n), endgame.WIN_STORE - headroom, player)
+				if m.is_terminal:
+					self.assertEqual(0, self.db.value(m, player))
+					continue
+				values = []
+				for a in m.get_actions(player):
+					before = m.plain_reward()
+					undo = m.play(a, player)
+					values.append(m.plain_reward() - before + (0 if m.is_terminal else self.db.value(m, 2 // player)))
+					m.unplay(undo)
+				self.assertEqual(max(values) if player == 1 else min(values), self.db.value(m, player))
+
+	def test_resume(self):
+		with open(self.path, "rb") as f:
+			expected = f.read()
+		path = os.path.join(self.dir.name, "resumed.db")
+		# Interrupted after two levels, later levels never written
+		with open(path, "wb") as f:
+			done = endgame.HEADER_SIZE + endgame.level_offset(2)
+			f.write(expected[:len(endgame.MAGIC) + 1] + bytes((2,)) + expected[len(endgame.MAGIC) + 2:done])
+			f.truncate(len(expected))
+		endgame.build(path, MAX_SEEDS, 2)
+		with open(path, "rb") as f:
+			self.assertEqual(expected, f.read())
+		with self.assertRaises(ValueError):
+			endgame.build(path, MAX_SEEDS + 1)
+		with self.assertRaises(ValueError):
+			endgame.build(os.path.join(self.dir.name, "large.db"), endgame.MAX_BUILD_SEEDS + 1)
+
+	def test_search(self):
+		algs.set_endgame(self.db)
+		# Covered positions are scored without searching
+		n = Node(self.game([0, 0, 0, 0, 1, 1, 1, 0, 0, 0, 0, 1], 22, 1))
+		self.assertEqual(self.db.reward(n.manc, 1), algs.alphabeta(n, NEG_INF, POS_INF, 5, False))
+		algs.fsss(n, 5)
+		self.assertEqual(2, n.player)
+		# Player 1 wins 25 to 23 by capturing
+		n = Node(self.game([0, 0, 0, 0, 0, 1, 1, 0, 0, 0, 0, 0], 23, 1))
+		self.assertEqual(1, algs.default_policy(n))
+		self.assertEqual(self.db.reward(n.manc, 1), algs.heuristic_policy(n))
@@ -1,7 +1,8 @@
 #  Copyright (c) 2019 Owen Siljander
+from random import Random
 from unittest import TestCase
 
-from mancala import Mancala
+from mancala import Mancala, SOW_CAPTURES, zobrist, REPEAT_NONE, REPEAT_END, REPEAT_OWN, TOTAL_SEEDS, REWARD_WEIGHTS
 
 
 class TestMancala(TestCase):
@@ -105,3 +106,160 @@ class TestMancala(TestCase):
 		for i in [4, 5, 6, 7, 8]:
 			self.assertIn(i, self.m.actions)
 		self.assertEqual(5, len(self.m.actions))
+
+	def test_hash(self):
+		# Incremental hash must always agree with a from-scratch hash
+		rng = Random(7)
+		player = 1
+		while not self.m.is_terminal:
+			self.m.play(rng.choice(self.m.get_actions(player)), player)
+			self.assertEqual(zobrist(self.m.board, self.m.p1_store, self.m.p2_store), self.m.hash)
+			player = 2 // player
+		# Transposed positions hash equally, different players to move do not
+		self.g.board = [0, 5, 5, 5, 5, 4, 4, 4, 4, 4, 4, 4]
+		self.assertEqual(Mancala().copy().hash, Mancala().hash)
+		self.assertNotEqual(self.g.position_hash(1), self.g.position_hash(2))
+		self.assertEqual(self.g.hash, Mancala.unpack(self.g.pack()).hash)
+
+	def test_pack(self):
+		self.m.play(0, 1)
+		self.m.play(7, 2)
+		state = self.m.pack()
+		self.assertEqual(14, len(state))
+		g = Mancala.unpack(state, 1, self.m.num_moves)
+		self.assertEqual(self.m.board, g.board)
+		self.assertEqual(self.m.get_actions(1), g.get_actions(1))
+		self.assertEqual(self.m.hash, g.hash)
+
+	def test_unplay(self):
+		rng = Random(11)
+		player = 1
+		history = []
+		while not self.m.is_terminal:
+			before = (list(self.m.board), list(self.m.actions), self.m.p1_store, self.m.p2_store, self.m.num_moves,
+			          self.m.hash)
+			undo = self.m.play(rng.choice(self.m.get_actions(player)), player)
+			history.append((before, undo))
+			player = 2 // player
+		while history:
+			before, undo = history.pop()
+			self.m.unplay(undo)
+			self.assertEqual(before, (self.m.board, self.m.actions, self.m.p1_store, self.m.p2_store,
+			                          self.m.num_moves, self.m.hash))
+			self.assertFalse(self.m.is_terminal)
+
+	def test_sowing_tables(self):
+		# 13 seeds go around the whole board once, including the emptied pit, and land one past it
+		self.m.board = [13, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1]
+		self.m.update_actions(1)
+		self.m.play(0, 1)
+		self.assertEqual([1, 2, 1, 1, 1, 1, 2, 2, 2, 2, 2, 2], self.m.board)
+		self.assertEqual(0, self.m.p1_store)
+		# Captures run back from the last pit sown and stop at the first pit that doesn't hold 2 or 3
+		self.m.board = [0, 0, 0, 0, 0, 4, 3, 2, 1, 1, 1, 0]
+		self.m.update_actions(1)
+		self.m.play(5, 1)
+		self.assertEqual([0, 0, 0, 0, 0, 0, 4, 0, 0, 0, 1, 0], self.m.board)
+		self.assertEqual(7, self.m.p1_store)
+		self.assertEqual((9, 8, 7, 6), SOW_CAPTURES[5][4])
+
+	def test_legal_mask(self):
+		self.assertEqual(0b111111, self.m.legal_mask(1))
+		self.m.play(2, 1)
+		self.assertEqual(0b111011, self.m.legal_mask(1))
+		self.assertEqual(0b111111, self.m.legal_mask(2))
+		# Grand slam excluded from the mask, feeding rule leaves only moves that reach the opponent
+		self.m.board = [1, 0, 2, 0, 0, 6, 2, 1, 2, 2, 1, 2]
+		self.m.update_actions(1)
+		self.assertEqual(0b000101, self.m.legal_mask(1))
+		self.m.board = [1, 6, 6, 6, 5, 4, 0, 0, 0, 0, 0, 0]
+		self.m.update_actions(1)
+		self.assertEqual(0b111110, self.m.legal_mask(1))
+
+	def test_repetition(self):
+		# Random games until one repeats a position
+		rng = Random(3)
+		while not self.m.repeated:
+			self.m = Mancala()
+			moves = []
+			player = 1
+			while not self.m.is_terminal:
+				moves.append(rng.choice(self.m.get_actions(player)))
+				undo = self.m.play(moves[-1], player)
+				player = 2 // player
+		# Ended as it stands, taking the move back restores the history
+		self.assertTrue(self.m.is_terminal)
+		self.assertEqual(undo[2:4], (self.m.p1_store, self.m.p2_store))
+		self.m.unplay(undo)
+		self.assertFalse(self.m.repeated)
+		self.assertIn(self.m.position_hash(2 // player), self.m.seen)
+		before = dict(self.m.seen)
+		self.m.unplay(self.m.play(moves[-1], 2 // player))
+		self.assertEqual(before, self.m.seen)
+		# The same moves under the other policies
+		for policy in (REPEAT_OWN, REPEAT_NONE):
+			g = Mancala()
+			g.repetition = policy
+			player = 1
+			for a in moves:
+				g = g.copy()
+				g.play(a, player)
+				player = 2 // player
+			if policy == REPEAT_OWN:
+				self.assertTrue(g.is_terminal)
+				self.assertEqual([0] * 12, g.board)
+				self.assertEqual(TOTAL_SEEDS, g.p1_store + g.p2_store)
+				self.assertEqual(zobrist(g.board, g.p1_store, g.p2_store), g.hash)
+			else:
+				self.assertFalse(g.is_terminal)
+				self.assertFalse(g.repeated)
+		self.assertEqual(REPEAT_END, Mancala.repetition)
+
+	def test_reward_after(self):
+		# Exactly the reward after playing the move, under every repetition policy
+		rng = Random(8)
+		for policy in (REPEAT_END, REPEAT_OWN, REPEAT_NONE):
+			for _ in range(0, 20):
+				m = Mancala()
+				m.repetition = policy
+				player = 1
+				while not m.is_terminal:
+					for pit in m.get_actions(player):
+						board = list(m.board)
+						value = m.reward_after(pit, player)
+						self.assertEqual(board, m.board)
+						undo = m.play(pit, player)
+						self.assertEqual(m.reward(2 // player), value)
+						m.unplay(undo)
+					m.play(rng.choice(m.get_actions(player)), player)
+					player = 2 // player
+
+	def test_reward_counts(self):
+		# Row counts kept by play() and unplay() match the board, and reward() the heuristics summed from scratch
+		def reward(m, player):
+			row = m.board[(player - 1) * 6:player * 6]
+			stores = (m.p1_store, m.p2_store) if player == 1 else (m.p2_store, m.p1_store)
+			return sum(x * y for x, y in zip([row[0], sum(row), sum(c != 0 for c in row), *stores], REWARD_WEIGHTS))
+
+		def check(m):
+			g = m.copy()
+			g.rehash()
+			self.assertEqual((g.filled, g.p1_seeds, g.p2_seeds), (m.filled, m.p1_seeds, m.p2_seeds))
+			self.assertEqual(reward(m, 1), m.reward(1))
+			self.assertEqual(reward(m, 2), m.reward(2))
+
+		rng = Random(12)
+		for policy in (REPEAT_END, REPEAT_OWN):
+			for _ in range(0, 20):
+				m = Mancala()
+				m.repetition = policy
+				player = 1
+				undos = []
+				while not m.is_terminal:
+					check(m)
+					undos.append(m.play(rng.choice(m.get_actions(player)), player))
+					player = 2 // player
+				check(m)
+				while undos:
+					m.unplay(undos.pop())
+					check(m)
@@ -3,7 +3,7 @@
 from unittest import TestCase
 
 from mancala import Mancala
-from node import Node
+from node import Node, POS_INF
 
 
 class TestNode(TestCase):
@@ -58,3 +58,24 @@ class TestNode(TestCase):
 		self.n.play(0)
 		self.assertEqual([0, 5, 5, 5, 5, 4, 4, 4, 4, 4, 4, 4], self.n.manc.board)
 		self.assertEqual(2, self.n.player)
+
+	def test_lazy(self):
+		# Slots only, algorithm fields are made the first time they are read
+		n = Node(Mancala())
+		self.assertFalse(hasattr(n, "__dict__"))
+		with self.assertRaises(AttributeError):
+			Node.children.__get__(n)
+		self.assertEqual([], n.children)
+		self.assertIs(n.children, n.children)
+		self.assertEqual(POS_INF, n.U)
+		with self.assertRaises(AttributeError):
+			n.missing
+		# play() starts the tree fields over and keeps the UCT statistics
+		n.visits += 3
+		n.children.append(Node.copy_node(n))
+		n.Uprime[0] = 1
+		n.play(0)
+		self.assertEqual(3, n.visits)
+		self.assertEqual([], n.children)
+		self.assertEqual({}, n.Uprime)
+		self.assertEqual([6, 7, 8, 9, 10, 11], n.untried_actions)
@@ -0,0 +1,51 @@
+#  Copyright (c) 2019 Owen Siljander
+
+from unittest import TestCase
+
+from mancala import Mancala
+from node import Node
+from parallel import RootParallelUCT, TreeParallelUCT
+
+
+class TestRootParallelUCT(TestCase):
+	def test_search(self):
+		with RootParallelUCT(2, seed=5, searches=3) as agent:
+			merged = agent.search(Node(Mancala()), 1, 30)
+		self.assertEqual([0, 1, 2, 3, 4, 5], sorted(merged))
+		self.assertEqual(30, sum(v for v, _ in merged.values()))
+
+	def test_deterministic(self):
+		boards = []
+		for _ in range(2):
+			n = Node(Mancala())
+			with RootParallelUCT(2, seed=9) as agent:
+				for _ in range(4):
+					agent(n, 1, 24)
+			boards.append(n.manc.board)
+		self.assertEqual(boards[0], boards[1])
+		self.assertEqual(4, n.manc.num_moves)
+
+	def test_small_limit(self):
+		# Fewer iterations than searches still expands something and plays a legal move
+		n = Node(Mancala())
+		with RootParallelUCT(2, seed=1, searches=4) as agent:
+			merged = agent.search(n, 1, 1)
+			self.assertEqual(1, sum(v for v, _ in merged.values()))
+			agent(n, 1, 1)
+			self.assertEqual({}, agent.search(n, 1, 0))
+			agent(n, 1, 0)
+		self.assertEqual(2, n.manc.num_moves)
+		self.assertEqual(1, n.player)
+
+
+class TestTreeParallelUCT(TestCase):
+	def test_search(self):
+		n = Node(Mancala())
+		with TreeParallelUCT(2, seed=3, leaves=4) as agent:
+			agent.search(n, 1, 30)
+			# Virtual losses are all taken back off, leaving one visit per simulation
+			self.assertEqual(30, n.visits)
+			self.assertEqual(30, sum(c.visits for c in n.children))
+			self.assertEqual(6, len(n.children))
+			agent(n, 1, 10)
+		self.assertEqual(2, n.player)
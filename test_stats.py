@@ -0,0 +1,126 @@
+#  Copyright (c) 2019 Owen Siljander
+
+from unittest import TestCase
+
+from algs import alphabeta, iterative_alphabeta, uct, fsss
+from mancala import Mancala
+from node import Node, NEG_INF, POS_INF
+from parallel import RootParallelUCT, TreeParallelUCT
+from stats import SearchStats, LatencyHistogram, game_phase
+from transposition import TranspositionTable
+from uct_tree import ArrayUCTAgent, uct_array
+
+
+class TestSearchStats(TestCase):
+	def test_alphabeta(self):
+		stats = SearchStats()
+		alphabeta(Node(Mancala()), NEG_INF, POS_INF, 4, True, stats=stats)
+		self.assertEqual(1, stats.searches)
+		self.assertEqual(4, stats.max_depth)
+		self.assertGreater(stats.nodes, stats.leaves)
+		self.assertGreater(stats.cutoffs, 0)
+		self.assertGreater(stats.elapsed, 0)
+		self.assertEqual(0, stats.tt_probes)
+		# Counts add up over moves
+		nodes = stats.nodes
+		alphabeta(Node(Mancala()), NEG_INF, POS_INF, 4, True, stats=stats)
+		self.assertEqual(2, stats.searches)
+		self.assertEqual(2 * nodes, stats.nodes)
+
+	def test_iterative(self):
+		stats = SearchStats()
+		table = TranspositionTable(1 << 12)
+		iterative_alphabeta(Node(Mancala()), max_depth=4, table=table, stats=stats)
+		self.assertEqual(4, stats.max_depth)
+		self.assertEqual(table.hits + table.misses, stats.tt_probes)
+		self.assertEqual(table.hit_rate(), stats.tt_hit_rate())
+
+	def test_uct(self):
+		stats = SearchStats()
+		uct(Node(Mancala()), 1, 30, stats=stats)
+		self.assertEqual(30, stats.leaves)
+		self.assertEqual(30, stats.nodes)
+		self.assertGreaterEqual(stats.max_depth, 2)
+
+	def test_uct_array(self):
+		stats = SearchStats()
+		uct_array(Node(Mancala()), 1, 30, stats=stats)
+		self.assertEqual(30, stats.leaves)
+		self.assertEqual(30, stats.nodes)
+		self.assertGreaterEqual(stats.max_depth, 2)
+		agent = ArrayUCTAgent(1, 20)
+		n = Node(Mancala())
+		agent(n, stats)
+		self.assertEqual(2, stats.searches)
+		self.assertEqual(50, stats.leaves)
+		self.assertGreater(stats.elapsed, 0)
+
+	def test_parallel(self):
+		stats = SearchStats()
+		with RootParallelUCT(2, seed=3, searches=3) as agent:
+			agent(Node(Mancala()), 1, 30, stats=stats)
+		# Counts are summed over the workers' searches, the time is the call's wall time
+		self.assertEqual(1, stats.searches)
+		self.assertEqual(30, stats.leaves)
+		self.assertEqual(30, stats.nodes)
+		self.assertGreaterEqual(stats.max_depth, 1)
+		self.assertGreater(stats.elapsed, 0)
+		stats = SearchStats()
+		with TreeParallelUCT(2, seed=3, leaves=4) as agent:
+			agent(Node(Mancala()), 1, 30, stats=stats)
+		self.assertEqual(1, stats.searches)
+		self.assertEqual(30, stats.leaves)
+		self.assertEqual(30, stats.nodes)
+		self.assertGreaterEqual(stats.max_depth, 2)
+		self.assertGreater(stats.nodes_per_sec(), 0)
+
+	def test_fsss(self):
+		stats = SearchStats()
+		fsss(Node(Mancala()), 2, stats)
+		self.assertEqual(2, stats.max_depth)
+		self.assertGreaterEqual(stats.nodes, 6)
+
+	def test_merge(self):
+		a = SearchStats()
+		a.nodes, a.leaves, a.max_depth, a.elapsed, a.searches = 10, 5, 3, 0.5, 1
+		b = SearchStats()
+		b.merge(a.as_dict())
+		b.merge(a)
+		self.assertEqual(20, b.nodes)
+		self.assertEqual(3, b.max_depth)
+		self.assertEqual(20, b.nodes_per_sec())
+		self.assertEqual(0, SearchStats().nodes_per_sec())
+
+
+class TestLatencyHistogram(TestCase):
+	def test_percentile(self):
+		h = LatencyHistogram()
+		self.assertEqual(0, h.percentile(50))
+		for ns in range(1, 1001):
+			h.record(ns * 1000)
+		self.assertEqual(1000, h.count)
+		self.assertEqual(1000000, h.max)
+		self.assertEqual(1000000, h.percentile(100))
+		# Buckets are within a ninth of the true value
+		for p in (50, 90, 99):
+			self.assertAlmostEqual(p * 10000, h.percentile(p), delta=p * 10000 / 9)
+			self.assertGreaterEqual(h.percentile(p), p * 10000)
+
+	def test_merge(self):
+		# Merging parts, also through as_dict() as done between processes, is the same as recording everything at once
+		whole = LatencyHistogram()
+		parts = [LatencyHistogram() for _ in range(0, 3)]
+		for ns in range(0, 3000, 7):
+			whole.record(ns * ns)
+			parts[ns % 3].record(ns * ns)
+		merged = LatencyHistogram()
+		merged.merge(parts[0])
+		for h in parts[1:]:
+			merged.merge(h.as_dict())
+		self.assertEqual(whole.as_dict(), merged.as_dict())
+		self.assertEqual(whole.as_dict(), LatencyHistogram.from_dict(whole.as_dict()).as_dict())
+
+	def test_game_phase(self):
+		self.assertEqual("opening", game_phase(48))
+		self.assertEqual("middlegame", game_phase(30))
+		self.assertEqual("endgame", game_phase(10))
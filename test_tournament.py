@@ -0,0 +1,92 @@
+#  Copyright (c) 2019 Owen Siljander
+
+import os
+import tempfile
+from unittest import TestCase
+
+import tournament
+from main import add_to_stats
+
+CONFIGS = [{"alg": "random"}, {"alg": "alphabeta", "depth": 1}, {"name": "uct", "alg": "uct", "limit": 5}]
+
+
+class TestTournament(TestCase):
+	def test_games(self):
+		jobs = tournament.games(CONFIGS, tournament.round_robin(3, 2), 7)
+		self.assertEqual(6, len(jobs))
+		self.assertEqual([(0, 0), (0, 1), (1, 0), (1, 1), (2, 0), (2, 1)], [j[:2] for j in jobs])
+		# Colours alternate within a pairing
+		self.assertEqual((CONFIGS[0], CONFIGS[1]), jobs[0][2:4])
+		self.assertEqual((CONFIGS[1], CONFIGS[0]), jobs[1][2:4])
+		self.assertEqual(6, len(set(j[4] for j in jobs)))
+		self.assertEqual(jobs, tournament.games(CONFIGS, tournament.round_robin(3, 2), 7))
+		# More games per pairing keep the earlier ones
+		longer = tournament.games(CONFIGS, tournament.round_robin(3, 4), 7)
+		self.assertTrue(all(j in longer for j in jobs))
+
+	def test_make_agent(self):
+		self.assertEqual("alphabeta(depth=1)", tournament.agent_name(CONFIGS[1]))
+		self.assertEqual("uct", tournament.agent_name(CONFIGS[2]))
+		with self.assertRaises(ValueError):
+			tournament.make_agent({"alg": "minimax"})
+		with self.assertRaises(ValueError):
+			tournament.make_agent({"alg": "uct", "depth": 3})
+
+	def test_play_game(self):
+		# Same seed, same game
+		job = (0, 0, CONFIGS[0], CONFIGS[2], 5)
+		a = tournament.play_game(job)
+		b = tournament.play_game(job)
+		for k in ("p1_store", "p2_store", "moves", "winner"):
+			self.assertEqual(a[k], b[k])
+		self.assertEqual("random()", a["p1"])
+		self.assertEqual(0, a["p1_stats"]["searches"])
+		self.assertEqual(a["p2_stats"]["searches"] * 5, a["p2_stats"]["leaves"])
+		# One latency per move, the first is in the opening
+		self.assertEqual(a["moves"], sum(h["count"] for p in ("p1_latency", "p2_latency") for h in a[p].values()))
+		self.assertGreaterEqual(a["p1_latency"]["opening"]["count"], 1)
+
+	def test_run(self):
+		with tempfile.TemporaryDirectory() as d:
+			path = os.path.join(d, "results.jsonl")
+			results = list(tournament.run(CONFIGS[:2], [(0, 1, 4)], path, 2))
+			self.assertEqual(4, len(results))
+			self.assertEqual([0, 1, 2, 3], sorted(r["game"] for r in results))
+			self.assertEqual(sorted(r["game"] for r in results),
+			                 sorted(r["game"] for r in tournament.read_results(path)))
+			# Latencies from all the workers add up to every move played
+			stats = {}
+			for r in results:
+				add_to_stats(stats, r)
+			moves = sum(h["all"].count for s in stats.values() for h in s.latency.values())
+			self.assertEqual(sum(r["moves"] for r in results), moves)
+
+	def test_resume(self):
+		with tempfile.TemporaryDirectory() as d:
+			path = os.path.join(d, "results.jsonl")
+			first = list(tournament.run(CONFIGS[:2], [(0, 1, 3)], path, 2))
+			# Crash in the middle of writing a result
+			with open(path, "a") as f:
+				f.write('{"game": 3, "se')
+			self.assertEqual(3, len(tournament.read_results(path)))
+			rest = list(tournament.run(CONFIGS[:2], [(0, 1, 5)], path, 2))
+			self.assertEqual([3, 4], sorted(r["game"] for r in rest))
+			results = tournament.read_results(path)
+			self.assertEqual(list(range(0, 5)), sorted(r["game"] for r in results))
+			self.assertEqual(sorted(r["seed"] for r in first), sorted(r["seed"] for r in results[:3]))
+			# Nothing left to play
+			self.assertEqual([], list(tournament.run(CONFIGS[:2], [(0, 1, 5)], path, 2)))
+			with self.assertRaises(ValueError):
+				list(tournament.run(CONFIGS[:2], [(0, 1, 5)], path, 2, seed=1))
+
+	def test_extend(self):
+		# More games per pairing of a round robin, only the new ones are played
+		with tempfile.TemporaryDirectory() as d:
+			path = os.path.join(d, "results.jsonl")
+			first = list(tournament.run(CONFIGS, tournament.round_robin(3, 2), path, 2))
+			rest = list(tournament.run(CONFIGS, tournament.round_robin(3, 4), path, 2))
+			played = sorted((r["pairing"], r["game"]) for r in rest)
+			self.assertEqual([(p, g) for p in range(0, 3) for g in (2, 3)], played)
+			results = tournament.read_results(path)
+			self.assertEqual(12, len(results))
+			self.assertEqual(sorted(r["seed"] for r in first), sorted(r["seed"] for r in results[:6]))
@@ -0,0 +1,52 @@
+#  Copyright (c) 2019 Owen Siljander
+
+from random import Random
+from unittest import TestCase
+
+from algs import alphabeta
+from mancala import Mancala
+from node import Node, NEG_INF, POS_INF
+from transposition import TranspositionTable, EXACT, LOWER
+
+
+class TestTranspositionTable(TestCase):
+	def setUp(self):
+		self.t = TranspositionTable(4)
+
+	def test_store_probe(self):
+		self.assertIsNone(self.t.probe(10))
+		self.t.store(10, 3, EXACT, 1.5, 2)
+		self.assertEqual((3, EXACT, 1.5, 2), self.t.probe(10))
+		self.assertEqual(1, self.t.hits)
+		self.assertEqual(1, self.t.misses)
+		# Same bucket, different position
+		self.assertIsNone(self.t.probe(12))
+		self.assertEqual(1, self.t.collisions)
+
+	def test_replacement(self):
+		self.t.store(10, 5, EXACT, 1, 0)
+		# Shallower entry goes to the always-replace slot and doesn't evict the deep one
+		self.t.store(12, 2, LOWER, 2, 1)
+		self.t.store(14, 1, LOWER, 3, 1)
+		self.assertEqual(5, self.t.probe(10)[0])
+		self.assertIsNone(self.t.probe(12))
+		self.assertEqual(3, self.t.probe(14)[2])
+		# Deeper entry takes the depth-preferred slot
+		self.t.store(16, 6, EXACT, 4, 3)
+		self.assertIsNone(self.t.probe(10))
+		self.assertEqual(2, len(self.t))
+		self.t.clear()
+		self.assertEqual(0, len(self.t))
+		self.assertEqual(0, self.t.hits)
+
+	def test_alphabeta(self):
+		# Same values with and without a table
+		rng = Random(1)
+		n = Node(Mancala())
+		for _ in range(20):
+			for depth in range(1, 6):
+				self.assertEqual(alphabeta(n, NEG_INF, POS_INF, depth, False),
+				                 alphabeta(n, NEG_INF, POS_INF, depth, False, TranspositionTable(1 << 12)))
+			if n.leaf:
+				break
+			n.play(rng.choice(n.get_actions()))
@@ -1,9 +1,14 @@
 #  Copyright (c) 2019 Owen Siljander
 
-from unittest import TestCase
+from unittest import TestCase, skipUnless
 from mancala import Mancala
 from node import Node
-from algs import uct
+from algs import uct, UCTAgent
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
 
 
 class TestUct(TestCase):
@@ -13,5 +18,35 @@ class TestUct(TestCase):
 	def test_uct(self):
 		constant = 1
 		limit = 10
-		uct(self.n, constant, limit)
-		uct(self.n, constant, limit)
+		uct(self.n, constant, limit, 0)
+		uct(self.n, constant, limit, 0)
+
+	@skipUnless(np, "NumPy not installed")
+	def test_uct_batched(self):
+		uct(self.n, 1, 10, 0, 20, np.random.default_rng(0))
+		self.assertEqual(2, self.n.player)
+		self.assertEqual(1, self.n.manc.num_moves)
+
+	def test_uct_agent(self):
+		agent = UCTAgent(1, 60)
+		agent(self.n)
+		kept = agent.root
+		self.assertIsNone(kept.parent)
+		self.assertEqual(self.n.manc.board, kept.manc.board)
+		# Opponent replies with a move the tree has already looked at
+		reply = kept.children[0]
+		visits = reply.visits
+		self.assertGreater(visits, 0)
+		self.n.play(reply.action)
+		agent(self.n)
+		# Search continued from the reply's statistics
+		self.assertEqual(1, agent.reused)
+		self.assertEqual(visits + 60, reply.visits)
+		self.assertEqual([], kept.children)
+		self.assertEqual(3, self.n.manc.num_moves)
+		# Unknown positions start a new tree
+		agent.reset()
+		self.assertIsNone(agent.root)
+		self.n.play(self.n.get_actions()[0])
+		agent(self.n)
+		self.assertEqual(1, agent.reused)
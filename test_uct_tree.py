@@ -0,0 +1,155 @@
+#  Copyright (c) 2019 Owen Siljander
+
+import random
+import sys
+from unittest import TestCase
+
+from algs import uct
+from mancala import Mancala
+from node import Node
+from uct_tree import ArrayUCTAgent, UCTTree, uct_array
+
+
+class TestUCTTree(TestCase):
+	def setUp(self):
+		self.n = Node(Mancala())
+
+	def test_search(self):
+		tree = UCTTree(self.n)
+		tree.search(1, 50)
+		self.assertEqual(50, tree.visits[0])
+		self.assertEqual(6, tree.child_count[0])
+		self.assertEqual(50, sum(tree.visits[1:7]))
+		# Children are contiguous and point back at their parent
+		self.assertEqual([0] * 6, list(tree.parent[1:7]))
+		self.assertEqual([0, 1, 2, 3, 4, 5], list(tree.action[1:7]))
+		self.assertEqual(Mancala().board, self.n.manc.board)
+
+	def test_same_as_uct(self):
+		# Same random state must give the same move as the Node based tree
+		rng = random.Random(8)
+		for _ in range(8):
+			boards = []
+			for agent in (uct, uct_array):
+				n = Node(self.n.manc.copy(), self.n.player)
+				random.seed(4)
+				agent(n, 1, 40)
+				boards.append(n.manc.board)
+			self.assertEqual(boards[0], boards[1])
+			self.n.play(rng.choice(self.n.get_actions()))
+
+	def test_history(self):
+		# Every tried node's game has the history of playing the path down to it, captures included
+		n = Node(self.n.manc.copy(), self.n.player)
+		for a in (2, 8, 3, 9):
+			n.play(a)
+		tree = UCTTree(n)
+		tree.search(1, 300)
+		for i in filter(lambda j: tree.visits[j], range(0, len(tree))):
+			path = []
+			j = i
+			while j != 0:
+				path.append(tree.action[j])
+				j = tree.parent[j]
+			m = n.manc.copy()
+			player = n.player
+			for a in reversed(path):
+				m.play(a, player)
+				player = 2 // player
+			self.assertEqual(m.seen, tree.game(i).seen)
+			self.assertEqual(m.board, tree.game(i).board)
+
+	def test_repetition(self):
+		# Seeds going round an empty board come back to the starting position 12 moves later
+		manc = Mancala.unpack(bytes([0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 1, 23, 23]), 1)
+		tree = UCTTree(Node(manc.copy(), 1))
+		tree.search(1, 100)
+		self.assertEqual(13, len(tree))
+		self.assertTrue(tree.terminal[12])
+		# Moves played before the root count too, and stay counted when rerooting
+		n = Node(manc.copy(), 1)
+		for _ in range(0, 4):
+			n.play(n.get_actions()[0])
+		tree = UCTTree(n)
+		tree.search(1, 100)
+		self.assertEqual(9, len(tree))
+		tree.reroot(2)
+		tree.search(1, 100)
+		self.assertEqual(7, len(tree))
+		self.assertTrue(tree.terminal[6])
+		# The tree reaches the same moves as the Node based one
+		boards = []
+		for agent in (uct, uct_array):
+			m = Node(n.manc.copy(), n.player)
+			random.seed(4)
+			agent(m, 1, 40)
+			boards.append(m.manc.board)
+		self.assertEqual(boards[0], boards[1])
+
+	def test_memory(self):
+		tree = UCTTree(self.n)
+		tree.search(1, 200)
+		arrays = (tree.visits, tree.reward, tree.parent, tree.first_child, tree.child_count, tree.tried, tree.action,
+		          tree.player, tree.num_moves, tree.terminal, tree.hashes)
+		per_node = (sum(a.itemsize for a in arrays) * len(tree) + len(tree.states)) / len(tree)
+		self.assertLess(per_node, 100)
+		self.assertGreater(sys.getsizeof(Node(Mancala())), per_node)
+
+	def test_node_budget(self):
+		tree = UCTTree(self.n, 60)
+		tree.search(1, 400)
+		self.assertEqual(400, tree.visits[0])
+		self.assertLessEqual(tree.high_water, 60)
+		self.assertLessEqual(len(tree.visits), 60)
+		self.assertGreater(tree.evictions, 0)
+		# Every live node is reachable from the root
+		reachable = 0
+		stack = [0]
+		while stack:
+			i = stack.pop()
+			reachable += 1
+			if tree.child_count[i] > 0:
+				stack.extend(range(tree.first_child[i], tree.first_child[i] + tree.child_count[i]))
+		self.assertEqual(len(tree), reachable)
+
+	def test_reroot(self):
+		tree = UCTTree(self.n)
+		tree.search(1, 100)
+		best = tree.best_child(0, 1)
+		visits = tree.visits[best]
+		action = tree.action[best]
+		tree.reroot(best)
+		self.assertEqual(visits, tree.visits[0])
+		self.assertEqual(action, tree.action[0])
+		self.assertEqual(-1, tree.parent[0])
+		self.assertEqual(visits, sum(tree.visits[1:1 + tree.child_count[0]]) + 1)
+		self.assertEqual([0] * tree.child_count[0], list(tree.parent[1:1 + tree.child_count[0]]))
+
+	def test_agent(self):
+		agent = ArrayUCTAgent(1, 60)
+		agent(self.n)
+		reply = agent.tree.first_child[0]
+		self.n.play(agent.tree.action[reply])
+		agent(self.n)
+		self.assertEqual(1, agent.reused)
+		self.assertEqual(3, self.n.manc.num_moves)
+
+	def test_agent_budget(self):
+		agent = ArrayUCTAgent(1, 60, max_nodes=100)
+		for _ in range(0, 4):
+			agent(self.n)
+			if agent.tree is not None:
+				self.assertLessEqual(agent.tree.high_water, 100)
+			self.n.play(self.n.get_actions()[0])
+		self.assertEqual(8, self.n.manc.num_moves)
+
+	def test_agent_evicted(self):
+		# A budget of the root and its children leaves no room for grandchildren, so the move played never has children
+		# to reroot to and every move starts from a fresh root
+		agent = ArrayUCTAgent(1, 30, max_nodes=7)
+		agent(self.n)
+		self.assertIsNone(agent.tree)
+		self.n.play(self.n.get_actions()[0])
+		agent(self.n)
+		self.assertEqual(0, agent.reused)
+		self.assertEqual(3, self.n.manc.num_moves)
@@ -0,0 +1,197 @@
+#  Copyright (c) 2019 Owen Siljander
+"""
+Tournaments between agent configurations, played in parallel. An agent configuration is a dictionary naming the
+algorithm and its parameters, for example {"alg": "uct", "constant": 1, "limit": 500, "policy": 0}. A schedule is a
+list of (first agent, second agent, number of games) using indices into the list of configurations, colours alternate
+between the games of a pairing. Every game gets its own seed and its result is written as one JSON line as soon as it
+finishes. The results file doubles as the checkpoint: a game is numbered and seeded from its pairing's place in the
+schedule and its place in the pairing alone, so rerunning an interrupted or extended tournament only plays the games
+that have no result yet.
+"""
+import json
+import os
+import random
+import time
+from multiprocessing import Pool
+
+from algs import alphabeta, iterative_alphabeta, uct, fsss, random_agent
+from logs import enable_logging
+from mancala import Mancala
+from node import Node, NEG_INF, POS_INF
+from stats import SearchStats, LatencyHistogram, game_phase
+
+# Parameters of each algorithm and their defaults
+ALGORITHMS = {
+	"random": {},
+	"alphabeta": {"depth": 3},
+	"iterative": {"max_time": None, "max_nodes": None, "max_depth": 8},
+	"uct": {"constant": 1, "limit": 500, "policy": 0},
+	"fsss": {"depth": 3},
+}
+
+
+def agent_name(config: dict) -> str:
+	"""Name of an agent configuration, its "name" entry or the algorithm and parameters"""
+	if "name" in config:
+		return config["name"]
+	params = ",".join("{0}={1}".format(k, v) for k, v in sorted(config.items()) if k != "alg")
+	return "{0}({1})".format(config["alg"], params)
+
+
+def make_agent(config: dict):
+	"""
+	Creates the move function for an agent configuration.
+	:param config: Agent configuration
+	:return: Function playing one move on a Node, adding the search's counts to a SearchStats
+	:raises ValueError: Unknown algorithm or parameter
+	"""
+	alg = config.get("alg")
+	if alg not in ALGORITHMS:
+		raise ValueError("Unknown algorithm {0}".format(alg))
+	params = dict(ALGORITHMS[alg])
+	for k, v in config.items():
+		if k not in params and k not in ("alg", "name"):
+			raise ValueError("Unknown parameter {0} for {1}".format(k, alg))
+		if k in params:
+			params[k] = v
+	if alg == "random":
+		return lambda n, stats: random_agent(n)
+	if alg == "alphabeta":
+		return lambda n, stats: alphabeta(n, NEG_INF, POS_INF, params["depth"], True, stats=stats)
+	if alg == "iterative":
+		return lambda n, stats: iterative_alphabeta(n, params["max_time"], params["max_nodes"], params["max_depth"],
+		                                            stats=stats)
+	if alg == "uct":
+		return lambda n, stats: uct(n, params["constant"], params["limit"], params["policy"], stats=stats)
+	return lambda n, stats: fsss(n, params["depth"], stats)
+
+
+def round_robin(agents: int, games: int) -> list:
+	"""
+	Schedule where every agent plays every other agent.
+	:param agents: Number of agent configurations
+	:param games: Games per pairing
+	:return: Schedule
+	"""
+	return [(a, b, games) for a in range(0, agents) for b in range(a + 1, agents)]
+
+
+def games(configs: list, schedule: list, seed: int = 0) -> list:
+	"""
+	Expands a schedule into individual games. A game is numbered within its pairing and seeded from the pairing's index
+	in the schedule and that number, so the same arguments always give the same games and playing more games of a
+	pairing leaves the earlier ones as they were.
+	:param configs: Agent configurations
+	:param schedule: List of (agent, agent, number of games)
+	:param seed: Base seed
+	:return: List of (pairing index, game number within the pairing, player 1 config, player 2 config, seed)
+	"""
+	jobs = []
+	for pairing, (a, b, count) in enumerate(schedule):
+		for game in range(0, count):
+			p1, p2 = (a, b) if game % 2 == 0 else (b, a)
+			jobs.append((pairing, game, configs[p1], configs[p2], (seed * 1000003 + pairing) * 1000003 + game))
+	return jobs
+
+
+def play_game(job: tuple) -> dict:
+	"""
+	Plays one game, also the worker side of run().
+	:param job: (pairing index, game number within the pairing, player 1 config, player 2 config, seed)
+	:return: Result record
+	"""
+	pairing, game, c1, c2, game_seed = job
+	random.seed(game_seed)
+	agents = (None, make_agent(c1), make_agent(c2))
+	stats = (None, SearchStats(), SearchStats())
+	# Player to phase to move latencies
+	latency = (None, {}, {})
+	think = [0, 0, 0]
+	n = Node(Mancala())
+	start = time.perf_counter_ns()
+	while not n.leaf:
+		player = n.player
+		phase = game_phase(sum(n.manc.board))
+		t = time.perf_counter_ns()
+		agents[player](n, stats[player])
+		t = time.perf_counter_ns() - t
+		think[player] += t
+		latency[player].setdefault(phase, LatencyHistogram()).record(t)
+	manc = n.manc
+	return {
+		"pairing": pairing,
+		"game": game,
+		"seed": game_seed,
+		"p1": agent_name(c1),
+		"p2": agent_name(c2),
+		"p1_store": manc.p1_store,
+		"p2_store": manc.p2_store,
+		"winner": 1 if manc.p1_store > manc.p2_store else 2 if manc.p2_store > manc.p1_store else 0,
+		"moves": manc.num_moves,
+		"reward": n.reward(),
+		"time_ms": (time.perf_counter_ns() - start) / 1e6,
+		"p1_time_ms": think[1] / 1e6,
+		"p2_time_ms": think[2] / 1e6,
+		"p1_stats": stats[1].as_dict(),
+		"p2_stats": stats[2].as_dict(),
+		"p1_latency": {phase: h.as_dict() for phase, h in latency[1].items()},
+		"p2_latency": {phase: h.as_dict() for phase, h in latency[2].items()},
+	}
+
+
+def run(configs: list, schedule: list, path: str, workers: int = None, seed: int = 0, log: str = None):
+	"""
+	Plays a tournament on a process pool, appending each result to a JSONL file as it finishes. If the file already
+	holds results of the same tournament those games are skipped, so an interrupted tournament carries on where it
+	stopped. Games are keyed on their pairing and their number within it, so playing more games of a pairing or adding
+	pairings at the end of the schedule keeps the earlier games' numbers and seeds.
+	:param configs: Agent configurations
+	:param schedule: List of (agent, agent, number of games)
+	:param path: JSONL results file
+	:param workers: Worker processes, defaults to the number of CPUs
+	:param seed: Base seed
+	:param log: Log file name for each worker, see logs.enable_logging(). None to not log.
+	:return: Generator of result records of the games played, in the order they finish
+	:raises ValueError: The file holds results of a different tournament
+	"""
+	jobs = {j[:2]: j for j in games(configs, schedule, seed)}
+	done = set()
+	if os.path.exists(path):
+		_truncate_partial(path)
+		for r in read_results(path):
+			key = (r.get("pairing"), r["game"])
+			job = jobs.get(key)
+			if job is None or r["seed"] != job[4] or r["p1"] != agent_name(job[2]) or r["p2"] != agent_name(job[3]):
+				raise ValueError("{0} holds results of a different tournament, game {2} of pairing {1} doesn't "
+				                 "match".format(path, *key))
+			done.add(key)
+	jobs = [j for key, j in jobs.items() if key not in done]
+	if not jobs:
+		return
+	init, args = (enable_logging, (log,)) if log else (None, ())
+	with open(path, "a") as out, Pool(workers or os.cpu_count() or 1, init, args) as pool:
+		for result in pool.imap_unordered(play_game, jobs):
+			out.write(json.dumps(result) + "\n")
+			out.flush()
+			os.fsync(out.fileno())
+			yield result
+
+
+def _truncate_partial(path: str) -> None:
+	"""Cuts off a last line left unfinished by a crash, so appended results start on a line of their own"""
+	with open(path, "rb+") as f:
+		data = f.read()
+		if data and not data.endswith(b"\n"):
+			f.truncate(data.rfind(b"\n") + 1)
+
+
+def read_results(path: str) -> list:
+	"""
+	Reads a JSONL results file. A last line left unfinished by a crash is ignored.
+	:param path: Results file
+	:return: List of result records
+	"""
+	with open(path) as f:
+		lines = f.read().split("\n")
+	# Everything after the last newline is either empty or unfinished
+	return [json.loads(line) for line in lines[:-1] if line.strip()]
@@ -0,0 +1,86 @@
+#  Copyright (c) 2019 Owen Siljander
+
+# Bound types stored alongside a value
+EXACT = 0
+LOWER = 1  # Value is a lower bound, search failed high
+UPPER = 2  # Value is an upper bound, search failed low
+SOLVED = 1 << 30  # Depth stored for a subtree searched to the end of every line, its value holds at any depth
+
+
+class TranspositionTable:
+	"""
+	Fixed size transposition table keyed by Mancala.position_hash().
+	Entries live in buckets of two slots. The first slot keeps the deepest search seen for that bucket, the second is
+	always overwritten, so memory never grows past the entry cap no matter how long the table is used.
+	"""
+
+	def __init__(self, max_entries: int = 1 << 20):
+		"""
+		:param max_entries: Maximum number of entries held, rounded down to an even number (two per bucket).
+		"""
+		if max_entries < 2:
+			raise ValueError("Transposition table needs room for at least 2 entries, got {0}".format(max_entries))
+		self.buckets = max_entries // 2
+		self.slots = [None] * (self.buckets * 2)  # Entries are (key, depth, bound, value, move)
+		self.hits = 0
+		self.misses = 0
+		self.collisions = 0  # Probes that found the bucket occupied by other positions
+		self.stores = 0
+
+	def __len__(self):
+		return sum(1 for x in self.slots if x is not None)
+
+	def __repr__(self):
+		return "TT {0}/{1} entries, {2} hits, {3} misses, {4} collisions, hit rate {5:.3f}".format(
+			len(self), len(self.slots), self.hits, self.misses, self.collisions, self.hit_rate())
+
+	def probe(self, key: int):
+		"""
+		Looks a position up.
+		:param key: Position hash.
+		:return: (depth, bound, value, move) if the position is stored, otherwise None.
+		"""
+		i = key % self.buckets * 2
+		for entry in (self.slots[i], self.slots[i + 1]):
+			if entry is not None and entry[0] == key:
+				self.hits += 1
+				return entry[1:]
+		self.misses += 1
+		if self.slots[i] is not None or self.slots[i + 1] is not None:
+			self.collisions += 1
+		return None
+
+	def store(self, key: int, depth: int, bound: int, value: float, move: int) -> None:
+		"""
+		Stores a search result. Goes to the depth-preferred slot if it is at least as deep as what is there (or it's the
+		same position), otherwise to the always-replace slot.
+		:param key: Position hash.
+		:param depth: Remaining depth the value was searched to, SOLVED if no line was cut off by the depth limit.
+		:param bound: EXACT, LOWER or UPPER.
+		:param value: Search value.
+		:param move: Best move found, -1 if none.
+		"""
+		i = key % self.buckets * 2
+		deep = self.slots[i]
+		self.stores += 1
+		if deep is None or deep[0] == key or depth >= deep[1]:
+			self.slots[i] = (key, depth, bound, value, move)
+		else:
+			self.slots[i + 1] = (key, depth, bound, value, move)
+
+	def hit_rate(self) -> float:
+		"""Fraction of probes that found their position"""
+		probes = self.hits + self.misses
+		return self.hits / probes if probes else 0.0
+
+	def reset_stats(self) -> None:
+		"""Zeroes the counters, stored entries are kept"""
+		self.hits = 0
+		self.misses = 0
+		self.collisions = 0
+		self.stores = 0
+
+	def clear(self) -> None:
+		"""Removes every entry and zeroes the counters"""
+		self.slots = [None] * (self.buckets * 2)
+		self.reset_stats()
@@ -0,0 +1,400 @@
+#  Copyright (c) 2019 Owen Siljander
+from array import array
+
+from algs import default_policy, heuristic_policy, ucb1, _play_book, NEG_INF
+from mancala import Mancala, BD_SIZE, PITS_PER_ROW
+from node import Node
+from stats import SearchStats
+
+STATE_SIZE = BD_SIZE + 2  # Length of Mancala.pack()
+NO_NODE = -1
+FREE = -2  # Parent of a node that is in the free pool
+
+
+class UCTTree:
+	"""
+	UCT tree stored as parallel arrays indexed by node number instead of Node objects. Each node costs a few tens of bytes.
+	The children of a node are allocated together when it is first expanded, so they occupy a contiguous range
+	[first_child, first_child + child_count). A child's game state is only filled in when it is first tried.
+	Node 0 is the root. A node's game history is the root's history followed by the positions on the path down to it,
+	cut at the last capture, so repetitions are detected as they are in the Node based tree.
+
+	With a node budget, nodes come from a pool. Once it is full, expanding evicts the children of the least visited
+	nodes whose children are all unexpanded. Evicted nodes' visits and rewards are already counted in their parent,
+	which becomes unexpanded again.
+	"""
+
+	def __init__(self, m_node: Node, max_nodes: int = None):
+		"""
+		:param m_node: Node whose position becomes the root, it is not modified
+		:param max_nodes: Node budget, None for no limit
+		"""
+		if max_nodes is not None and max_nodes < 1 + PITS_PER_ROW:
+			raise ValueError("Node budget must fit the root and its children, got {0}".format(max_nodes))
+		self.max_nodes = max_nodes
+		self.free = [[] for _ in range(0, PITS_PER_ROW + 1)]  # free[k] holds the first index of free blocks of k nodes
+		self.free_nodes = 0
+		self.high_water = 0  # Most nodes in use at once
+		self.evictions = 0  # Number of child blocks evicted
+		self.evicted_nodes = 0
+		self._clear()
+		self.root_seen = dict(m_node.manc.seen)  # History of the root's game, see Mancala.seen
+		self.repetition = m_node.manc.repetition
+		self._add(NO_NODE, -1, m_node.player)
+		self._set_state(0, m_node.manc)
+		self.high_water = 1
+
+	def _clear(self) -> None:
+		"""Empties the node arrays"""
+		self.visits = array('L')
+		self.reward = array('d')
+		self.parent = array('l')
+		self.first_child = array('l')
+		self.child_count = array('b')  # -1 until the node has been expanded
+		self.tried = array('b')  # Children tried so far, in order
+		self.action = array('b')
+		self.player = array('b')
+		self.num_moves = array('H')
+		self.terminal = array('b')
+		self.hashes = array('Q')  # Position hash with the player to move, see Mancala.position_hash()
+		self.states = bytearray()  # STATE_SIZE bytes per node, see Mancala.pack()
+
+	def __len__(self):
+		"""Number of nodes in use"""
+		return len(self.visits) - self.free_nodes
+
+	def _add(self, parent: int, action: int, player: int) -> int:
+		"""Appends a node without a state, returns its index"""
+		self.visits.append(0)
+		self.reward.append(0)
+		self.parent.append(parent)
+		self.first_child.append(NO_NODE)
+		self.child_count.append(-1)
+		self.tried.append(0)
+		self.action.append(action)
+		self.player.append(player)
+		self.num_moves.append(0)
+		self.terminal.append(0)
+		self.hashes.append(0)
+		self.states.extend(bytes(STATE_SIZE))
+		return len(self.visits) - 1
+
+	def _reset(self, i: int, parent: int, action: int, player: int) -> None:
+		"""Reinitialises a node taken from the free pool"""
+		self.visits[i] = 0
+		self.reward[i] = 0
+		self.parent[i] = parent
+		self.first_child[i] = NO_NODE
+		self.child_count[i] = -1
+		self.tried[i] = 0
+		self.action[i] = action
+		self.player[i] = player
+
+	def _alloc(self, parent: int, actions: list, player: int) -> int:
+		"""
+		Allocates a contiguous block of children for parent, evicting other blocks if the budget is used up.
+		:param parent: Node being expanded
+		:param actions: Action of each child
+		:param player: Player to move in the children
+		:return: Index of the first child, NO_NODE if no room could be made
+		"""
+		count = len(actions)
+		while True:
+			for size in range(count, PITS_PER_ROW + 1):
+				if self.free[size]:
+					first = self.free[size].pop()
+					if size > count:
+						# Split the block, the rest stays free
+						self.free[size - count].append(first + count)
+					self.free_nodes -= count
+					for k, a in enumerate(actions):
+						self._reset(first + k, parent, a, player)
+					break
+			else:
+				if self.max_nodes is None or len(self.visits) + count <= self.max_nodes:
+					first = len(self.visits)
+					for a in actions:
+						self._add(parent, a, player)
+				elif self._evict(self.parent[parent], count):
+					continue
+				else:
+					return NO_NODE
+			self.high_water = max(self.high_water, len(self))
+			return first
+
+	def _evict(self, protect: int, needed: int) -> int:
+		"""
+		Frees the child blocks of the least visited nodes whose children are all unexpanded, about an eighth of the budget
+		at a time so that the scan is not repeated on every expansion.
+		:param protect: Node whose children must be kept, the parent of the node being expanded
+		:param needed: Nodes needed
+		:return: Number of nodes freed
+		"""
+		child_count = self.child_count
+		candidates = []
+		for j in range(0, len(self.visits)):
+			count = child_count[j]
+			if count > 0 and j != protect and self.parent[j] != FREE:
+				first = self.first_child[j]
+				if all(child_count[c] == -1 for c in range(first, first + count)):
+					candidates.append(j)
+		candidates.sort(key=lambda j: self.visits[j])
+		target = max(needed, self.max_nodes // 8)
+		freed = 0
+		for j in candidates:
+			if freed >= target:
+				break
+			first = self.first_child[j]
+			count = child_count[j]
+			for c in range(first, first + count):
+				self.parent[c] = FREE
+			self.free[count].append(first)
+			self.free_nodes += count
+			self.first_child[j] = NO_NODE
+			child_count[j] = -1
+			self.tried[j] = 0
+			self.evictions += 1
+			self.evicted_nodes += count
+			freed += count
+		return freed
+
+	def _set_state(self, i: int, manc: Mancala) -> None:
+		"""Stores a game as the state of node i"""
+		self.states[i * STATE_SIZE:(i + 1) * STATE_SIZE] = manc.pack()
+		self.num_moves[i] = manc.num_moves
+		self.terminal[i] = manc.is_terminal
+		self.hashes[i] = manc.position_hash(self.player[i])
+
+	def game(self, i: int) -> Mancala:
+		"""
+		Rebuilds the game at node i.
+		:param i: Node index, its state must have been filled in
+		:return: Mancala, with its history since the last capture
+		"""
+		states = self.states
+		m = Mancala.unpack(bytes(states[i * STATE_SIZE:(i + 1) * STATE_SIZE]), self.player[i], self.num_moves[i])
+		# Games ended by captures or the move limit aren't detected by update_actions
+		m.is_terminal = bool(self.terminal[i])
+		m.repetition = self.repetition
+		# Walk up to the last capture, stores only change on captures
+		seen = {}
+		j = i
+		while j != 0:
+			key = self.hashes[j]
+			seen[key] = seen.get(key, 0) + 1
+			parent = self.parent[j]
+			if states[parent * STATE_SIZE + BD_SIZE:(parent + 1) * STATE_SIZE] != \
+					states[j * STATE_SIZE + BD_SIZE:(j + 1) * STATE_SIZE]:
+				break
+			j = parent
+		else:
+			for key, count in self.root_seen.items():
+				seen[key] = seen.get(key, 0) + count
+		m.seen = seen
+		return m
+
+	def expand(self, i: int) -> int:
+		"""
+		Tries the next untried action of node i, allocating all of its children the first time.
+		:param i: Node index
+		:return: Index of the child, or i if the node budget is used up and nothing could be evicted
+		"""
+		manc = self.game(i)
+		player = self.player[i]
+		if self.child_count[i] == -1:
+			actions = manc.get_actions(player)
+			first = self._alloc(i, actions, 2 // player)
+			if first == NO_NODE:
+				# No room, simulate from the node itself
+				return i
+			self.first_child[i] = first
+			self.child_count[i] = len(actions)
+		child = self.first_child[i] + self.tried[i]
+		self.tried[i] += 1
+		manc.play(self.action[child], player)
+		self._set_state(child, manc)
+		return child
+
+	def best_child(self, i: int, c: float) -> int:
+		"""
+		Child of node i with the best UCB1 value, same as best_uct_child().
+		:param i: Node index, all of its children must have been tried
+		:param c: Constant for UCB1
+		:return: Index of the child
+		"""
+		visits = self.visits
+		reward = self.reward
+		parent_visits = visits[i]
+		best = NEG_INF
+		first = self.first_child[i]
+		max_child = first
+		for j in range(first, first + self.child_count[i]):
+			res = ucb1(reward[j], visits[j], parent_visits, c)
+			if res > best:
+				best = res
+				max_child = j
+		return max_child
+
+	def tree_policy(self, c: float) -> int:
+		"""
+		Selects the node to simulate, same as tree_policy().
+		:param c: Constant for UCB1
+		:return: Node index
+		"""
+		i = 0
+		while not self.terminal[i]:
+			if self.tried[i] != self.child_count[i]:
+				return self.expand(i)
+			i = self.best_child(i, c)
+		return i
+
+	def back_propagate(self, i: int, delta: float, visits: int = 1) -> None:
+		"""Adds the result of a simulation to node i and its ancestors"""
+		while i != NO_NODE:
+			self.visits[i] += visits
+			self.reward[i] += delta
+			i = self.parent[i]
+
+	def child(self, i: int, manc: Mancala, player: int) -> int:
+		"""
+		Finds the tried child of node i that holds the given position.
+		:return: Node index, NO_NODE if there isn't one
+		"""
+		state = manc.pack()
+		first = self.first_child[i]
+		for j in range(first, first + self.tried[i]):
+			if self.player[j] == player and self.num_moves[j] == manc.num_moves and \
+					self.states[j * STATE_SIZE:(j + 1) * STATE_SIZE] == state:
+				return j
+		return NO_NODE
+
+	def reroot(self, i: int) -> None:
+		"""
+		Makes node i the root, keeping only its subtree. The kept nodes are copied into fresh arrays, children blocks
+		staying contiguous, so nothing from the rest of the tree lingers in memory.
+		:param i: New root
+		:return: None
+		"""
+		self.root_seen = self.game(i).seen
+		old = (self.visits, self.reward, self.first_child, self.child_count, self.tried, self.action, self.player,
+		       self.num_moves, self.terminal, self.hashes, self.states)
+		visits, reward, first_child, child_count, tried, action, player, num_moves, terminal, hashes, states = old
+		self._clear()
+		self.free = [[] for _ in range(0, PITS_PER_ROW + 1)]
+		self.free_nodes = 0
+		# Breadth first, pairs of (old index, new parent)
+		queue = [(i, NO_NODE)]
+		k = 0
+		while k < len(queue):
+			j, parent = queue[k]
+			new = len(self.visits)
+			self._add(parent, action[j], player[j])
+			self.visits[new] = visits[j]
+			self.reward[new] = reward[j]
+			self.tried[new] = tried[j]
+			self.num_moves[new] = num_moves[j]
+			self.terminal[new] = terminal[j]
+			self.hashes[new] = hashes[j]
+			self.states[new * STATE_SIZE:(new + 1) * STATE_SIZE] = states[j * STATE_SIZE:(j + 1) * STATE_SIZE]
+			if child_count[j] > 0:
+				# Children are appended together, so their new indices are contiguous
+				self.child_count[new] = child_count[j]
+				self.first_child[new] = len(queue)
+				for c in range(first_child[j], first_child[j] + child_count[j]):
+					queue.append((c, new))
+			k += 1
+
+	def search(self, constant, limit, policy=0, stats: SearchStats = None) -> None:
+		"""
+		Grows the tree, same parameters as uct().
+		"""
+		if stats is None:
+			stats = SearchStats()
+		stats.start()
+		for _ in range(0, limit):
+			i = self.tree_policy(constant)
+			if self.visits[i] == 0 and i != 0:
+				# Just expanded
+				stats.nodes += 1
+			depth = 0
+			j = i
+			while j != 0:
+				depth += 1
+				j = self.parent[j]
+			if depth > stats.max_depth:
+				stats.max_depth = depth
+			stats.leaves += 1
+			n = Node(self.game(i), self.player[i])
+			if policy == 0:
+				delta = default_policy(n)
+			else:
+				delta = heuristic_policy(n)
+			self.back_propagate(i, delta)
+		stats.stop()
+
+
+def uct_array(m_node: Node, constant, limit, policy=0, max_nodes: int = None, stats: SearchStats = None) -> None:
+	"""
+	UCT using an array backed tree, plays the same moves as uct() given the same random state. Nodes carry the game's
+	history, so repeated positions end games in the tree and in simulations as they do for uct().
+	:param m_node: Node to choose action for
+	:param constant: Constant for UCB1
+	:param limit: Max number of expansions
+	:param policy: Policy for reward
+	:param max_nodes: Node budget for the tree, None for no limit
+	:param stats: Optional SearchStats to add this search's counts to
+	:return: None
+	"""
+	if _play_book(m_node):
+		return
+	tree = UCTTree(m_node, max_nodes)
+	tree.search(constant, limit, policy, stats)
+	m_node.play(tree.action[tree.best_child(0, constant)])
+
+
+class ArrayUCTAgent:
+	"""
+	Array backed UCT that keeps its tree between turns, like UCTAgent, with an optional node budget.
+	"""
+
+	def __init__(self, constant, limit, policy=0, max_nodes: int = None):
+		"""
+		Parameters are the same as for uct_array().
+		"""
+		self.constant = constant
+		self.limit = limit
+		self.policy = policy
+		self.max_nodes = max_nodes
+		self.tree = None  # Rooted at the position after this agent's last move
+		self.reused = 0
+
+	def reset(self) -> None:
+		"""Drops the tree, call between games"""
+		self.tree = None
+
+	def __call__(self, m_node: Node, stats: SearchStats = None) -> None:
+		"""
+		Plays a move for the node.
+		:param m_node: Node to choose action for
+		:param stats: Optional SearchStats to add this search's counts to
+		:return: None
+		"""
+		if _play_book(m_node):
+			self.reset()
+			return
+		tree = self.tree
+		i = NO_NODE if tree is None else tree.child(0, m_node.manc, m_node.player)
+		if i == NO_NODE:
+			tree = self.tree = UCTTree(m_node, self.max_nodes)
+		else:
+			tree.reroot(i)
+			self.reused += 1
+		tree.search(self.constant, self.limit, self.policy, stats)
+		best = tree.best_child(0, self.constant)
+		m_node.play(tree.action[best])
+		if tree.child_count[best] == -1:
+			# Its children were evicted, or never allocated, so there is nothing to find the reply in. Start a fresh root
+			# next move.
+			self.tree = None
+		else:
+			tree.reroot(best)